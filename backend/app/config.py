@@ -14,12 +14,108 @@ class Settings(BaseSettings):
     # TTS (ChatTTS — 速度最快，音质好)
     tts_model: str = "ChatTTS"
     tts_speed: float = 1.0  # 0.25 ~ 4.0
+    tts_segment_chars: int = 150  # 长文本按句合成时单段的最大字数
+    tts_concurrency: int = 4  # 按句合成的并发数
+    tts_cache_max_mb: int = 256  # 合成音频缓存（位于 temp_dir/cache 下）
+
+    # 共享 HTTP 客户端（TTS 等外部接口），默认 HTTP/1.1 keep-alive；开启 HTTP/2 需要安装 h2
+    http2: bool = False
+    http_timeout: float = 60.0
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
 
     # STT (SenseVoice)
     stt_model: str = "SenseVoice"
+    stt_engine: str = "remote"  # remote: 调用 OpenAI 兼容接口；local: 进程内小型 Whisper 模型
+    stt_local_model_size: str = "base"
+    stt_language: str = ""  # 本地识别语言，留空自动检测
+    stt_cpu_threads: int = 2
 
     # Whisper
     whisper_model_size: str = "base"
+    whisper_preload: bool = True  # 启动时后台预加载并预热模型
+    whisper_preload_sizes: str = ""  # 额外常驻的模型大小，逗号分隔，如 "small,medium"
+    whisper_replicas: int = 2  # 每个模型大小的副本数（并发转录数），应与 scheduler_transcribe_workers 一致
+    whisper_memory_budget_mb: int = 0  # 模型常驻内存预算（估算），超出时淘汰最久未用的空闲副本，0 为不限
+    whisper_parallel_workers: int = 0  # > 1 时按静音切分窗口，多进程并行转录
+    whisper_window_seconds: int = 600
+    whisper_window_overlap_seconds: float = 2.0  # 窗口两侧额外送入的上下文音频总长（切点只在静音处）
+
+    # 流式转录：ffmpeg 管道解码，边下载边转录，不落地完整 WAV
+    transcribe_streaming: bool = False
+    transcribe_stream_window_seconds: int = 60
+
+    # 字幕优先：平台已有字幕时直接使用，不下载音频、不跑 Whisper
+    transcribe_subtitles: bool = False
+    subtitle_languages: str = "zh-Hans,zh-CN,zh,en"  # 人工字幕的语言偏好，逗号分隔
+    subtitle_auto_captions: bool = True  # 没有人工字幕时使用原始语言的自动字幕
+    subtitle_min_coverage: float = 0.6  # 字幕覆盖时长低于视频时长的该比例时回退 Whisper
+
+    # 转录缓存（位于 temp_dir/cache 下）
+    transcribe_cache_max_mb: int = 2048
+
+    # 转录存储：转录完成后保存在服务端，问答/笔记接口按 transcript_id 引用
+    transcript_store_max_mb: int = 1024
+    transcript_memory_entries: int = 16  # 内存中保留的已解压转录数
+
+    # 笔记生成（长文本分块摘要 map-reduce）
+    note_chunk_tokens: int = 8000  # 单个分块的估算 token 上限（含重叠；中文约等于旧版 8000 字分块）
+    note_map_concurrency: int = 4  # 分块摘要并发数
+    note_max_retries: int = 3
+    note_context_budget: int = 16000  # 合并摘要的估算 token 预算，超出时分层合并
+    note_cache_max_mb: int = 256  # 笔记结果与分块摘要缓存（位于 temp_dir/cache 下）
+
+    # 视频问答：转录超出全文上限时，只检索最相关的片段发送
+    qa_full_context_tokens: int = 8000  # 估算 token 不超过该值时直接发送全文
+    qa_top_k: int = 6
+    qa_passage_tokens: int = 300  # 检索段落的估算 token 大小
+    qa_index_cache_size: int = 32  # 内存中缓存的视频检索索引数
+    qa_session_ttl_seconds: int = 3600  # 多轮问答会话闲置超时
+    qa_session_max: int = 500
+    qa_history_tokens: int = 4000  # 对话历史超出该估算 token 数时压缩较早的轮次
+    qa_history_keep_turns: int = 2  # 压缩时保留原文的最近轮数
+    qa_stream_usage: bool = True  # 流式响应附带 token 用量（服务商不支持时关闭）
+    qa_answer_cache_size: int = 1000  # 首轮问答答案缓存条数，0 为关闭
+    qa_answer_cache_ttl: int = 24 * 3600
+    qa_answer_cache_similarity: float = 0.0  # > 0 时按词项相似度匹配相近问题，如 0.8
+
+    # 任务调度：各类别独立的并发上限，排队超过上限时拒绝新任务（429）
+    scheduler_preview_workers: int = 4
+    scheduler_download_workers: int = 2
+    scheduler_transcribe_workers: int = 2
+    scheduler_stt_workers: int = 1
+    scheduler_max_queued: int = 20  # 每个类别的排队上限，0 为不限
+
+    # 下载存储：相同视频、格式和清晰度只下载一次，超出上限时淘汰最久未访问的文件
+    download_store_max_mb: int = 10240
+    download_chunk_kb: int = 1024  # 文件下载接口每次读取发送的块大小
+    # 前置 nginx 的 internal location 前缀（如 /_downloads/），设置后由 nginx 用 sendfile 发送文件
+    download_accel_redirect: str = ""
+
+    # 临时存储配额：temp_dir 总占用（中间文件 + 下载 + 缓存）超出时淘汰最久未用的已完成下载
+    storage_quota_mb: int = 20480  # 0 为不限
+    storage_partial_ttl_hours: int = 24  # 未完成的下载保留时长，超时后启动时清理
+
+    # 批量转录（播放列表/频道）：条目以批量优先级排队，不挤占单个视频的转录
+    batch_max_items: int = 200  # 单个批量任务最多展开的条目数
+    batch_concurrency: int = 2  # 单个批量任务同时提交转录的条目数
+
+    # 任务状态存储
+    task_ttl_seconds: int = 6 * 3600  # 任务结束后保留时长
+    task_max_entries: int = 1000  # 内存中最多保留的任务数
+    task_persist: bool = False  # 结束的任务写入 SQLite，重启后仍可查询
+    task_persist_max_mb: int = 512
+
+    # 多副本任务队列：留空时任务在 API 进程内执行；sqlite 时由独立工作进程（python -m app.worker）执行
+    job_queue: str = ""
+    job_queue_path: str = ""  # 默认 temp_dir/jobs.db
+    job_poll_interval: float = 0.5
+    job_lease_seconds: float = 120.0  # 工作进程失联超过该时长，其任务重新排队
+    worker_concurrency: int = 2
+
+    # 视频元数据缓存（预览、转录、下载共用）
+    video_info_cache_ttl: int = 1800  # 秒，需短于平台媒体地址的有效期
+    video_info_cache_size: int = 256
 
     # YouTube（可选，加速预览）
     youtube_api_key: str = ""
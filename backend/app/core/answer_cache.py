@@ -0,0 +1,108 @@
+"""问答答案缓存 — 同一视频的相同（或相近）问题直接复用答案"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app.utils.retrieval import tokenize
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+class AnswerCache:
+    """按 (视频内容键, 规范化问题) 保存答案，TTL + LRU 淘汰
+
+    内容键由转录内容得出，转录变化后自然不再命中；也可按内容键主动失效。
+    similarity > 0 时，精确匹配未命中会在同一视频的已缓存问题中找词项 Jaccard 相似度
+    不低于阈值的最相近问题。线程安全。
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity: float = 0.0) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._similarity = similarity
+        self._entries: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        # 内容键 -> {规范化问题: 词项集合}，用于相似问题查找和按视频失效
+        self._questions: dict[str, dict[str, frozenset[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """规范化问题：全半角统一、小写、去掉空白和标点"""
+        return _NON_WORD_RE.sub("", unicodedata.normalize("NFKC", question).lower())
+
+    @staticmethod
+    def terms(question: str) -> frozenset[str]:
+        """相似匹配用的词项：在保留空白和标点的原问题上分词，英文单词才能分开"""
+        return frozenset(tokenize(unicodedata.normalize("NFKC", question).lower()))
+
+    def get(self, content_key: str, question: str) -> str | None:
+        """查找缓存的答案，未命中返回 None"""
+        normalized = self.normalize(question)
+        with self._lock:
+            key = (content_key, normalized)
+            if key not in self._entries and self._similarity > 0:
+                key = (content_key, self._closest(content_key, normalized, question))
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self._ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, content_key: str, question: str, answer: str) -> None:
+        normalized = self.normalize(question)
+        if not normalized or not answer:
+            return
+        with self._lock:
+            key = (content_key, normalized)
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            self._questions.setdefault(content_key, {})[normalized] = self.terms(question)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, content_key: str) -> int:
+        """删除某个视频内容的全部缓存答案，返回删除条数"""
+        with self._lock:
+            questions = self._questions.pop(content_key, {})
+            for normalized in questions:
+                self._entries.pop((content_key, normalized), None)
+            return len(questions)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _closest(self, content_key: str, normalized: str, question: str) -> str:
+        """同一视频下与问题最相近的已缓存问题，低于阈值时返回原问题"""
+        terms = self.terms(question)
+        best, best_score = normalized, 0.0
+        if not terms:
+            return best
+        for candidate, candidate_terms in self._questions.get(content_key, {}).items():
+            score = len(terms & candidate_terms) / len(terms | candidate_terms)
+            if score >= self._similarity and score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        questions = self._questions.get(key[0])
+        if questions is not None:
+            questions.pop(key[1], None)
+            if not questions:
+                del self._questions[key[0]]
@@ -0,0 +1,118 @@
+"""磁盘缓存 — SQLite 键值存储，按容量 LRU 淘汰"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """基于 SQLite 的键值缓存，总大小超出上限时淘汰最久未访问的条目
+
+    线程安全，可在线程池中直接调用；数据库在首次访问时才创建。
+    同一文件可被多个进程（API 副本、队列工作进程）共用，总大小每次在写事务中从库里统计。
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self._path = path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            conn = sqlite3.connect(
+                self._path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> bytes | None:
+        """读取缓存，命中时刷新访问时间"""
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        """写入缓存，必要时淘汰旧条目"""
+        size = len(value)
+        if size > self._max_bytes:
+            logger.warning("缓存条目过大，跳过: %s (%d 字节)", key, size)
+            return
+
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, value, size, time.time()),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str) -> None:
+        """删除缓存条目"""
+        with self._lock:
+            self._get_conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        """缓存条目的总大小（其他进程也会写入，每次从库里统计）"""
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按访问时间从旧到新淘汰，直到总大小不超过上限（在写事务中调用）"""
+        total = self._total_bytes(conn)
+        if total <= self._max_bytes:
+            return
+
+        cursor = conn.execute("SELECT key, size FROM entries ORDER BY accessed")
+        evicted: list[str] = []
+        for key, size in cursor:
+            if total <= self._max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        cursor.close()
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in evicted])
+        logger.info("缓存淘汰 %d 条: %s", len(evicted), self._path)
+
+    def stats(self) -> dict:
+        """缓存占用统计"""
+        with self._lock:
+            conn = self._get_conn()
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "entries": count,
+                "bytes": self._total_bytes(conn),
+                "max_bytes": self._max_bytes,
+            }
@@ -0,0 +1,307 @@
+"""下载内容存储 — 按 (视频 ID, 格式, 清晰度) 去重保存下载文件，支持断点续传与引用计数"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+from app.utils.ytdlp import normalize_video_id
+
+logger = logging.getLogger(__name__)
+
+# 存储创建的下载目录（_dir_name）与旧版本按 task_id 命名的散落文件（如 1a2b3c4d.mp4、1a2b3c4d.f137.mp4.part）
+_DIR_NAME_RE = re.compile(r"^[0-9a-f]{16}$")
+_LEGACY_FILE_RE = re.compile(r"^[0-9a-f]{8}\.[\w.-]+$")
+
+
+def process_alive(pid: int) -> bool:
+    """进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DownloadStore:
+    """下载文件的内容存储
+
+    每个 (视频 ID, 格式, 清晰度) 对应一个固定目录，下载中断后重新请求时 yt-dlp 在同一目录
+    续传 .part 文件；完成的文件登记到 SQLite 索引，按键直接定位，不扫描目录。
+    正在下载、转码或传输的文件持有引用，总大小超出上限时只淘汰无引用且最久未访问的文件。
+    引用按进程号记在索引库的 refs 表中，API 进程与队列工作进程共用存储时互相可见；
+    已退出进程留下的引用不再生效。线程安全。
+    """
+
+    _instance: "DownloadStore | None" = None
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self._root = root
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid = os.getpid()
+
+    @classmethod
+    def get_instance(cls) -> "DownloadStore":
+        """获取下载存储实例"""
+        if cls._instance is None:
+            cls._instance = cls(
+                os.path.join(settings.temp_dir, "downloads"),
+                settings.download_store_max_mb * 1024 * 1024,
+            )
+        return cls._instance
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    @staticmethod
+    def make_key(url: str, fmt: str, quality: str) -> str:
+        """存储键：规范视频 ID + 格式 + 清晰度（音频格式不区分清晰度）"""
+        if fmt == "mp3":
+            quality = "audio"
+        return f"{normalize_video_id(url)}|{fmt}|{quality}"
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self._root, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self._root, "index.db"),
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " key TEXT PRIMARY KEY,"
+                " video_id TEXT NOT NULL,"
+                " format TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " title TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_video ON artifacts(video_id, format)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS refs ("
+                " key TEXT NOT NULL,"
+                " pid INTEGER NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " PRIMARY KEY (key, pid))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def work_dir(self, key: str) -> str:
+        """键对应的固定下载目录（中断后在此续传）"""
+        path = os.path.join(self._root, self._dir_name(key))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _dir_name(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def lookup(self, key: str) -> tuple[str, str] | None:
+        """查找已完成的文件，返回 (路径, 标题)；索引中有但文件已丢失时删除记录"""
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                "SELECT path, title FROM artifacts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not os.path.isfile(row[0]):
+                self._remove(conn, key)
+                return None
+            conn.execute(
+                "UPDATE artifacts SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return row[0], row[1]
+
+    def find_video(self, url: str) -> tuple[str, str, str] | None:
+        """查找同一视频任意清晰度的 mp4 文件（用于转码出 mp3），返回 (键, 路径, 标题)"""
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT key, path, title FROM artifacts WHERE video_id = ? AND format = 'mp4'"
+                " ORDER BY size",
+                (normalize_video_id(url),),
+            ).fetchall()
+        for key, path, title in rows:
+            if os.path.isfile(path):
+                return key, path, title
+        return None
+
+    def add(self, key: str, path: str, title: str) -> None:
+        """登记下载完成的文件，并清理同目录下的中间文件，必要时淘汰旧文件"""
+        for name in os.listdir(os.path.dirname(path)):
+            leftover = os.path.join(os.path.dirname(path), name)
+            if leftover != path and os.path.isfile(leftover):
+                os.remove(leftover)
+
+        video_id, fmt, _ = key.split("|")
+        size = os.path.getsize(path)
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove(conn, key, keep_files=True)
+                conn.execute(
+                    "INSERT INTO artifacts (key, video_id, format, path, title, size, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, video_id, fmt, path, title, size, time.time()),
+                )
+                self._evict(conn, self._max_bytes, protect=key)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def trim(self, max_bytes: int) -> int:
+        """淘汰无引用的文件直到总大小不超过 max_bytes（存储配额调用），返回释放的字节数"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._total_bytes(conn)
+                self._evict(conn, max_bytes)
+                freed = before - self._total_bytes(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return freed
+
+    def sweep(self, max_age_seconds: float) -> int:
+        """清理未登记的残留：超过 max_age_seconds 未更新的未完成下载目录，以及旧版本散落的文件
+
+        只处理存储自己创建的目录名和旧版本的 task_id 文件名，其他文件不动。返回删除的条目数。
+        """
+        with self._lock:
+            conn = self._get_conn()
+            indexed = {
+                os.path.dirname(row[0])
+                for row in conn.execute("SELECT path FROM artifacts")
+            }
+            busy = {
+                os.path.join(self._root, self._dir_name(key))
+                for key in self._busy_keys(conn)
+            }
+
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self._root):
+            if entry.is_dir():
+                if not _DIR_NAME_RE.match(entry.name):
+                    continue
+                if entry.path in indexed or entry.path in busy:
+                    continue
+                if now - entry.stat().st_mtime < max_age_seconds:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                if not _LEGACY_FILE_RE.match(entry.name):
+                    continue
+                if now - entry.stat().st_mtime < max_age_seconds:
+                    continue
+                os.remove(entry.path)
+            removed += 1
+        if removed:
+            logger.info("清理下载存储残留 %d 项", removed)
+        return removed
+
+    def acquire(self, key: str) -> None:
+        """持有引用，期间文件不会被任何共用存储的进程淘汰或清理"""
+        with self._lock:
+            self._get_conn().execute(
+                "INSERT INTO refs (key, pid, count) VALUES (?, ?, 1)"
+                " ON CONFLICT (key, pid) DO UPDATE SET count = count + 1",
+                (key, self._pid),
+            )
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "UPDATE refs SET count = count - 1 WHERE key = ? AND pid = ?",
+                (key, self._pid),
+            )
+            conn.execute("DELETE FROM refs WHERE count <= 0")
+
+    def _busy_keys(self, conn: sqlite3.Connection) -> set[str]:
+        """有存活进程持有引用的键，顺带删除已退出进程的引用（需持有锁）"""
+        busy: set[str] = set()
+        dead: set[int] = set()
+        for key, pid in conn.execute("SELECT key, pid FROM refs").fetchall():
+            if pid == self._pid or process_alive(pid):
+                busy.add(key)
+            else:
+                dead.add(pid)
+        for pid in dead:
+            conn.execute("DELETE FROM refs WHERE pid = ?", (pid,))
+        return busy
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        """索引中文件的总大小（其他进程也会写入，每次从索引读取）"""
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def _remove(self, conn: sqlite3.Connection, key: str, keep_files: bool = False) -> None:
+        """删除索引记录（需持有锁），keep_files=False 时同时删除文件目录"""
+        row = conn.execute("SELECT path FROM artifacts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+        if not keep_files:
+            shutil.rmtree(os.path.dirname(row[0]), ignore_errors=True)
+
+    def _evict(
+        self, conn: sqlite3.Connection, max_bytes: int, protect: str | None = None
+    ) -> None:
+        """按访问时间从旧到新淘汰无引用的文件，直到总大小不超过 max_bytes（需持有锁，在事务中调用）"""
+        total = self._total_bytes(conn)
+        if total <= max_bytes:
+            return
+
+        busy = self._busy_keys(conn)
+        rows = conn.execute("SELECT key, size FROM artifacts ORDER BY accessed").fetchall()
+        evicted = 0
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            if key == protect or key in busy:
+                continue
+            self._remove(conn, key)
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info("下载存储淘汰 %d 个文件", evicted)
+
+    def stats(self) -> dict:
+        """下载存储占用统计"""
+        with self._lock:
+            conn = self._get_conn()
+            count = conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            in_use = conn.execute("SELECT COUNT(DISTINCT key) FROM refs").fetchone()[0]
+            return {
+                "entries": count,
+                "bytes": self._total_bytes(conn),
+                "max_bytes": self._max_bytes,
+                "in_use": in_use,
+            }
+
+
+def get_download_store() -> DownloadStore:
+    """获取下载存储的快捷方法"""
+    return DownloadStore.get_instance()
@@ -0,0 +1,50 @@
+"""共享 HTTP 客户端 — 连接池 + keep-alive，可用时启用 HTTP/2"""
+
+import importlib.util
+import logging
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClient:
+    """进程内共享的 httpx.AsyncClient，懒加载单例
+
+    复用 TCP/TLS 连接，避免每个请求重新握手；默认使用 HTTP/1.1 keep-alive，
+    HTTP2=true 时启用 HTTP/2（需要安装 h2：uv add "httpx[http2]"，未安装时退回 HTTP/1.1）。
+    """
+
+    _instance: httpx.AsyncClient | None = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """获取共享客户端实例"""
+        if cls._instance is None:
+            http2 = settings.http2 and importlib.util.find_spec("h2") is not None
+            if settings.http2 and not http2:
+                logger.warning("未安装 h2，HTTP 客户端使用 HTTP/1.1")
+            cls._instance = httpx.AsyncClient(
+                http2=http2,
+                timeout=httpx.Timeout(settings.http_timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return cls._instance
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭客户端及其连接池（应用退出时调用）"""
+        if cls._instance is not None:
+            await cls._instance.aclose()
+        cls._instance = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享 HTTP 客户端的快捷方法"""
+    return HTTPClient.get_client()
@@ -0,0 +1,241 @@
+"""任务队列后端 — 多副本部署时 API 进程入队、工作进程消费，任务状态跨进程共享"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """队列中的任务"""
+
+    id: int
+    kind: str
+    task_id: str
+    payload: dict
+
+
+class JobBackend(ABC):
+    """任务队列后端接口：任务入队/认领，以及任务状态的共享读写"""
+
+    @abstractmethod
+    def enqueue(
+        self, kind: str, task_id: str, payload: dict, dedupe_key: str | None = None
+    ) -> str:
+        """任务入队，返回负责执行的 task_id
+
+        同类任务中已有相同 dedupe_key 的任务排队或执行中时不再入队，task_id 作为其别名，
+        之后按 task_id 读取到的是该任务的状态。
+        """
+
+    @abstractmethod
+    def claim(self, kinds: list[str], worker_id: str) -> Job | None:
+        """认领一个排队中的任务，没有时返回 None"""
+
+    @abstractmethod
+    def heartbeat(self, job_ids: list[int]) -> None:
+        """续约进行中的任务，超时未续约的任务会被重新排队"""
+
+    @abstractmethod
+    def complete(self, job_id: int) -> None:
+        """标记任务已执行完毕"""
+
+    @abstractmethod
+    def save_state(self, kind: str, task_id: str, data: bytes) -> None:
+        """写入任务状态快照"""
+
+    @abstractmethod
+    def load_state(self, kind: str, task_id: str) -> bytes | None:
+        """读取任务状态快照"""
+
+
+class SQLiteJobBackend(JobBackend):
+    """基于 SQLite 的队列后端，适用于单机多进程（多个 uvicorn worker + 独立工作进程）"""
+
+    def __init__(self, path: str, lease_seconds: float) -> None:
+        self._path = path
+        self._lease_seconds = lease_seconds
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一个连接，避免跨线程共享"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " task_id TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'queued',"
+                " worker TEXT,"
+                " heartbeat REAL,"
+                " dedupe_key TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "dedupe_key" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)"
+            )
+            # 同一 dedupe_key 同时只有一个排队或执行中的任务（任务完成即删除行）
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe"
+                " ON jobs(kind, dedupe_key) WHERE dedupe_key IS NOT NULL"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_states ("
+                " kind TEXT NOT NULL,"
+                " task_id TEXT NOT NULL,"
+                " data BLOB NOT NULL,"
+                " updated REAL NOT NULL,"
+                " PRIMARY KEY (kind, task_id))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_task_states_updated ON task_states(updated)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_aliases ("
+                " kind TEXT NOT NULL,"
+                " task_id TEXT NOT NULL,"
+                " target_id TEXT NOT NULL,"
+                " updated REAL NOT NULL,"
+                " PRIMARY KEY (kind, task_id))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def enqueue(
+        self, kind: str, task_id: str, payload: dict, dedupe_key: str | None = None
+    ) -> str:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, task_id, payload, dedupe_key)"
+                " VALUES (?, ?, ?, ?)",
+                (kind, task_id, json.dumps(payload, ensure_ascii=False), dedupe_key),
+            )
+            leader_id = task_id
+            if cursor.rowcount == 0:
+                leader_id = conn.execute(
+                    "SELECT task_id FROM jobs WHERE kind = ? AND dedupe_key = ?",
+                    (kind, dedupe_key),
+                ).fetchone()[0]
+                conn.execute(
+                    "INSERT OR REPLACE INTO task_aliases (kind, task_id, target_id, updated)"
+                    " VALUES (?, ?, ?, ?)",
+                    (kind, task_id, leader_id, time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM task_states WHERE kind = ? AND task_id = ?",
+                    (kind, task_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return leader_id
+
+    def claim(self, kinds: list[str], worker_id: str) -> Job | None:
+        conn = self._conn()
+        now = time.time()
+        placeholders = ",".join("?" * len(kinds))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 工作进程崩溃后租约过期的任务重新排队
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL"
+                " WHERE status = 'running' AND heartbeat < ?",
+                (now - self._lease_seconds,),
+            )
+            conn.execute(
+                "DELETE FROM task_states WHERE updated < ?",
+                (now - settings.task_ttl_seconds,),
+            )
+            conn.execute(
+                "DELETE FROM task_aliases WHERE updated < ? AND NOT EXISTS ("
+                " SELECT 1 FROM task_states s"
+                " WHERE s.kind = task_aliases.kind AND s.task_id = task_aliases.target_id)",
+                (now - settings.task_ttl_seconds,),
+            )
+            row = conn.execute(
+                f"SELECT id, kind, task_id, payload FROM jobs"
+                f" WHERE status = 'queued' AND kind IN ({placeholders})"
+                f" ORDER BY id LIMIT 1",
+                kinds,
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?"
+                " WHERE id = ?",
+                (worker_id, now, row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return Job(id=row[0], kind=row[1], task_id=row[2], payload=json.loads(row[3]))
+
+    def heartbeat(self, job_ids: list[int]) -> None:
+        if not job_ids:
+            return
+        self._conn().executemany(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ?",
+            [(time.time(), job_id) for job_id in job_ids],
+        )
+
+    def complete(self, job_id: int) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def save_state(self, kind: str, task_id: str, data: bytes) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO task_states (kind, task_id, data, updated)"
+            " VALUES (?, ?, ?, ?)",
+            (kind, task_id, data, time.time()),
+        )
+
+    def load_state(self, kind: str, task_id: str) -> bytes | None:
+        row = self._conn().execute(
+            "SELECT data FROM task_states WHERE kind = ? AND task_id = COALESCE("
+            " (SELECT target_id FROM task_aliases WHERE kind = ? AND task_id = ?), ?)",
+            (kind, kind, task_id, task_id),
+        ).fetchone()
+        return row[0] if row else None
+
+
+class JobQueue:
+    """任务队列后端单例，未配置 job_queue 时为 None（任务在 API 进程内执行）"""
+
+    _instance: JobBackend | None = None
+
+    @classmethod
+    def get_backend(cls) -> JobBackend | None:
+        """获取队列后端实例"""
+        if cls._instance is None and settings.job_queue:
+            if settings.job_queue != "sqlite":
+                raise ValueError(f"不支持的任务队列后端: {settings.job_queue}")
+            path = settings.job_queue_path or os.path.join(settings.temp_dir, "jobs.db")
+            cls._instance = SQLiteJobBackend(path, settings.job_lease_seconds)
+            logger.info("任务队列后端: sqlite (%s)", path)
+        return cls._instance
+
+
+def get_job_backend() -> JobBackend | None:
+    """获取任务队列后端的快捷方法"""
+    return JobQueue.get_backend()
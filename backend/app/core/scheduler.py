@@ -0,0 +1,182 @@
+"""任务调度器 — 按任务类别隔离线程池，类别内按优先级排队，并做准入控制
+
+类别：preview（元数据提取）、download（下载）、transcribe（Whisper 转录）、stt（语音提问识别）。
+每个类别有独立的并发上限和排队上限，长转录不会占满下载或预览的线程；
+入口处用 admit 登记任务，从接受到结束都计入该类别（包括还在其他类别中排队的阶段），
+已接受的任务超过 并发数 + 排队上限 时 admit 抛出 SchedulerFull，路由返回 429。
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 优先级：数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BATCH = 10
+
+
+class SchedulerFull(Exception):
+    """类别排队已满，拒绝新任务"""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    on_position: Callable[[int], None] | None = field(compare=False, default=None)
+
+
+class JobLane:
+    """单个任务类别：固定大小的线程池 + 按 (优先级, 提交顺序) 排队的等待者
+
+    排队与放行都在事件循环线程中进行，同步函数在本类别的线程池中执行。
+    """
+
+    def __init__(self, name: str, workers: int, max_queued: int) -> None:
+        self.name = name
+        self._workers = max(1, workers)
+        self._max_queued = max_queued
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix=f"lane-{name}"
+        )
+        self._running = 0
+        self._admitted = 0
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor
+
+    def admit(self) -> None:
+        """准入检查并登记任务：已接受未结束的任务达到 并发数 + 排队上限 时抛出 SchedulerFull
+
+        通过后必须在任务结束时调用 leave。
+        """
+        if self._max_queued > 0 and self._admitted >= self._workers + self._max_queued:
+            raise SchedulerFull(f"{self.name} 任务排队已满，请稍后再试")
+        self._admitted += 1
+
+    def leave(self) -> None:
+        """已接受的任务结束（完成、失败或取消）"""
+        self._admitted = max(0, self._admitted - 1)
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        priority: int = PRIORITY_NORMAL,
+        on_position: Callable[[int], None] | None = None,
+    ) -> T:
+        """排队等待空闲槽位后，在本类别线程池中执行 fn(*args)
+
+        on_position 在排队位置变化时被调用（1 为下一个执行，0 为已开始执行）。
+        """
+        await self._acquire(priority, on_position)
+        try:
+            if on_position:
+                on_position(0)
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int, on_position: Callable[[int], None] | None) -> None:
+        if self._running < self._workers and not self._waiting:
+            self._running += 1
+            return
+
+        waiter = _Waiter(
+            priority, next(self._seq), asyncio.get_event_loop().create_future(), on_position
+        )
+        heapq.heappush(self._waiting, waiter)
+        self._report_positions()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已被放行但调用方取消，把槽位交给下一个
+                self._release()
+            elif waiter in self._waiting:
+                self._waiting.remove(waiter)
+                heapq.heapify(self._waiting)
+                self._report_positions()
+            raise
+
+    def _release(self) -> None:
+        while self._waiting:
+            waiter = heapq.heappop(self._waiting)
+            if not waiter.future.done():
+                # 槽位直接转交，_running 不变
+                waiter.future.set_result(None)
+                self._report_positions()
+                return
+        self._running -= 1
+
+    def _report_positions(self) -> None:
+        for position, waiter in enumerate(sorted(self._waiting), start=1):
+            if waiter.on_position:
+                waiter.on_position(position)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "running": self._running,
+            "queued": len(self._waiting),
+            "admitted": self._admitted,
+            "max_queued": self._max_queued,
+        }
+
+
+class Scheduler:
+    """任务调度器单例，首次使用时按配置创建各类别"""
+
+    _lanes: dict[str, JobLane] | None = None
+
+    @classmethod
+    def lanes(cls) -> dict[str, JobLane]:
+        if cls._lanes is None:
+            cls._lanes = {
+                "preview": JobLane(
+                    "preview", settings.scheduler_preview_workers, settings.scheduler_max_queued
+                ),
+                "download": JobLane(
+                    "download", settings.scheduler_download_workers, settings.scheduler_max_queued
+                ),
+                "transcribe": JobLane(
+                    "transcribe",
+                    settings.scheduler_transcribe_workers,
+                    settings.scheduler_max_queued,
+                ),
+                "stt": JobLane(
+                    "stt", settings.scheduler_stt_workers, settings.scheduler_max_queued
+                ),
+            }
+        return cls._lanes
+
+    @classmethod
+    def lane(cls, name: str) -> JobLane:
+        """获取任务类别"""
+        return cls.lanes()[name]
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {name: lane.stats() for name, lane in cls.lanes().items()}
+
+
+def get_lane(name: str) -> JobLane:
+    """获取任务类别的快捷方法"""
+    return Scheduler.lane(name)
@@ -0,0 +1,182 @@
+"""临时存储管理 — 按任务登记中间文件目录，任务结束即删除，并对 temp_dir 执行磁盘配额"""
+
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+from app.config import settings
+from app.core.download_store import get_download_store, process_alive
+
+logger = logging.getLogger(__name__)
+
+# 旧版本转录用 tempfile.mkdtemp 创建的目录名
+_LEGACY_TMP_RE = re.compile(r"^tmp[a-z0-9_]{8}$")
+
+
+def _dir_size(path: str) -> int:
+    """目录（或文件）占用的字节数"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _is_legacy_tmpdir(path: str, name: str, max_age_seconds: float) -> bool:
+    """是否为旧版本遗留的转录临时目录：mkdtemp 目录名、只有 audio.* 文件、超过 max_age_seconds 未更新
+
+    其他进程（或其他程序）在 temp_dir 下用 mkdtemp 创建的目录不满足这些条件，不会被删除。
+    """
+    if not _LEGACY_TMP_RE.match(name):
+        return False
+    cutoff = time.time() - max_age_seconds
+    try:
+        if os.stat(path).st_mtime > cutoff:
+            return False
+        return all(
+            entry.is_file()
+            and entry.name.startswith("audio.")
+            and entry.stat().st_mtime <= cutoff
+            for entry in os.scandir(path)
+        )
+    except OSError:
+        return False
+
+
+def _workdir_alive(name: str) -> bool:
+    """工作目录名对应的进程是否仍在运行"""
+    return name.isdigit() and process_alive(int(name))
+
+
+class StorageManager:
+    """temp_dir 的统一管理
+
+    - 转录等任务的中间文件（WAV 等）放在 temp_dir/work/<进程号>/<task_id>，结果落盘后随任务删除；
+    - 下载存储中已完成的文件可被淘汰，进行中任务的中间文件不可淘汰；
+    - 启动时清理上次异常退出留下的工作目录和过期的未完成下载；
+    - 配置 storage_quota_mb 时，新建工作目录或下载完成后检查总占用，超出时按最近最少使用
+      淘汰下载存储中无引用的文件。
+    线程安全。
+    """
+
+    _instance: "StorageManager | None" = None
+
+    def __init__(self, root: str, quota_bytes: int) -> None:
+        self._root = root
+        # 按进程分目录：API 进程与队列工作进程共用 temp_dir 时互不清理对方的工作目录
+        self._work_root = os.path.join(root, "work", str(os.getpid()))
+        self._quota_bytes = quota_bytes
+        self._workdirs: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.evicted_bytes = 0
+
+    @classmethod
+    def get_instance(cls) -> "StorageManager":
+        """获取存储管理器实例"""
+        if cls._instance is None:
+            cls._instance = cls(settings.temp_dir, settings.storage_quota_mb * 1024 * 1024)
+        return cls._instance
+
+    def create_workdir(self, task_id: str) -> str:
+        """为任务创建中间文件目录（重复调用返回同一目录），创建前先执行配额"""
+        self.enforce_quota()
+        with self._lock:
+            path = self._workdirs.get(task_id)
+            if path is None:
+                path = os.path.join(self._work_root, task_id)
+                os.makedirs(path, exist_ok=True)
+                self._workdirs[task_id] = path
+            return path
+
+    def release(self, task_id: str) -> None:
+        """删除任务的中间文件目录（结果已持久化或任务失败后调用）"""
+        with self._lock:
+            path = self._workdirs.pop(task_id, None)
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def cleanup(self) -> None:
+        """启动时清理：已退出进程的工作目录、过期的旧版本 tmp* 转录目录、过期的未完成下载"""
+        removed = 0
+        work_parent = os.path.dirname(self._work_root)
+        if os.path.isdir(work_parent):
+            for entry in os.scandir(work_parent):
+                if entry.path == self._work_root or _workdir_alive(entry.name):
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        max_age = settings.storage_partial_ttl_hours * 3600
+        if os.path.isdir(self._root):
+            # 旧版本每个转录任务用 tempfile.mkdtemp 创建，从未删除
+            for entry in os.scandir(self._root):
+                if entry.is_dir() and _is_legacy_tmpdir(entry.path, entry.name, max_age):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+        removed += get_download_store().sweep(max_age)
+        if removed:
+            logger.info("清理临时存储残留 %d 项", removed)
+
+    def enforce_quota(self) -> None:
+        """总占用超出配额时淘汰下载存储中无引用的文件"""
+        if self._quota_bytes <= 0:
+            return
+        used = self._used_bytes()
+        if used <= self._quota_bytes:
+            return
+
+        store = get_download_store()
+        downloads = store.stats()["bytes"]
+        target = max(0, downloads - (used - self._quota_bytes))
+        freed = store.trim(target)
+        self.evicted_bytes += freed
+        if used - freed > self._quota_bytes:
+            logger.warning(
+                "临时存储超出配额: %.1f / %.1f MB（剩余文件均在使用中）",
+                (used - freed) / 1024 / 1024,
+                self._quota_bytes / 1024 / 1024,
+            )
+
+    def _work_bytes(self) -> int:
+        """全部进程的中间文件占用"""
+        return _dir_size(os.path.dirname(self._work_root))
+
+    def _other_bytes(self) -> int:
+        """缓存、转录存储、任务持久化等 SQLite 文件的占用"""
+        total = 0
+        for name in ("cache", "transcripts", "tasks"):
+            total += _dir_size(os.path.join(self._root, name))
+        return total
+
+    def _used_bytes(self) -> int:
+        return (
+            self._work_bytes() + get_download_store().stats()["bytes"] + self._other_bytes()
+        )
+
+    def stats(self) -> dict:
+        """临时存储占用统计"""
+        work = self._work_bytes()
+        downloads = get_download_store().stats()
+        other = self._other_bytes()
+        used = work + downloads["bytes"] + other
+        return {
+            "used_bytes": used,
+            "quota_bytes": self._quota_bytes,
+            "usage_ratio": round(used / self._quota_bytes, 4) if self._quota_bytes else 0.0,
+            "work": {"tasks": len(self._workdirs), "bytes": work},
+            "downloads": downloads,
+            "caches_bytes": other,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+
+def get_storage_manager() -> StorageManager:
+    """获取存储管理器的快捷方法"""
+    return StorageManager.get_instance()
@@ -0,0 +1,329 @@
+"""任务状态存储 — 内存字典 + TTL 过期 + 容量淘汰，可选 SQLite 持久化已结束任务"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.job_queue import get_job_backend
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEvents:
+    """单个任务的变更通知：任意线程调用 notify，订阅者在事件循环中等待新版本
+
+    工作线程通过 loop.call_soon_threadsafe 唤醒订阅者，没有变更时订阅者不会被调度。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._waiters: list[asyncio.Future] = []
+        self.version = 0
+
+    def notify(self) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._wake()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # 事件循环已关闭（应用退出中）
+            pass
+
+    def _wake(self) -> None:
+        self.version += 1
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait(self, version: int, timeout: float) -> int:
+        """等待版本号变化，超时也返回（用作 SSE 心跳），返回当前版本号"""
+        if self.version != version:
+            return self.version
+
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return self.version
+
+
+def notify(task: dict) -> None:
+    """通知订阅者任务状态已变化（线程安全）"""
+    events: TaskEvents | None = task.get("_events")
+    if events is not None:
+        events.notify()
+
+
+def queue_reporter(task: dict) -> Callable[[int], None]:
+    """调度器排队位置回调：写入任务的 queue_position 并通知订阅者"""
+
+    def report(position: int) -> None:
+        if task.get("queue_position") != position:
+            task["queue_position"] = position
+            notify(task)
+
+    return report
+
+
+async def wait_for_change(task: dict, version: int, timeout: float = 15.0) -> int:
+    """等待任务状态变化，返回新的版本号
+
+    其他进程执行的任务（队列模式）没有本地通知通道，按轮询间隔返回以重新读取共享状态。
+    """
+    events: TaskEvents | None = task.get("_events")
+    if events is None:
+        await asyncio.sleep(settings.job_poll_interval)
+        return version + 1
+    return await events.wait(version, timeout)
+
+
+class TaskStore:
+    """异步任务状态存储
+
+    任务以可变 dict 保存在内存中，工作线程直接原地更新字段。任务结束后开始计算 TTL，
+    内存条目超出上限时优先淘汰最早结束的任务；进行中的任务不会被淘汰。
+    开启 task_persist 时，结束的任务压缩后写入 SQLite，重启后仍可按 task_id 查询。
+
+    队列模式（配置 job_queue）下，API 进程用 submit 入队，工作进程用 create 登记并执行，
+    工作进程定期把状态快照发布到队列后端，任意 API 副本都能用 get 读到最新状态。
+    读写队列后端和持久化存储的 SQLite 调用都在线程池中执行，不阻塞事件循环。
+    """
+
+    instances: dict[str, "TaskStore"] = {}
+
+    def __init__(
+        self,
+        name: str,
+        result_type: type[BaseModel] | None = None,
+        transient_fields: tuple[str, ...] = (),
+        restore: Callable[[dict], None] | None = None,
+    ) -> None:
+        self._name = name
+        self._result_type = result_type
+        self._transient_fields = transient_fields
+        self._restore = restore
+        self._tasks: dict[str, dict] = {}
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._aliases: dict[str, list[str]] = {}
+        self._published: dict[str, int] = {}
+        self._disk: DiskCache | None = None
+        if settings.task_persist:
+            self._disk = DiskCache(
+                os.path.join(settings.temp_dir, "tasks", f"{name}.db"),
+                settings.task_persist_max_mb * 1024 * 1024,
+            )
+        TaskStore.instances[name] = self
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    async def submit(
+        self, task_id: str, task: dict, args: dict, dedupe_key: str | None = None
+    ) -> str:
+        """队列模式：发布初始状态并入队，由工作进程执行
+
+        dedupe_key 相同的任务已在队列中或执行中时不再入队，task_id 合并到已有任务，
+        返回实际执行的 task_id。
+        """
+        backend = get_job_backend()
+        if backend is None:
+            raise RuntimeError("未配置任务队列后端")
+        data = self._dump(task, None, transient=True)
+        payload = {"task": task, "args": args}
+
+        def enqueue() -> str:
+            backend.save_state(self._name, task_id, data)
+            return backend.enqueue(self._name, task_id, payload, dedupe_key)
+
+        return await asyncio.get_running_loop().run_in_executor(None, enqueue)
+
+    def create(self, task_id: str, task: dict) -> dict:
+        """登记新任务（需在事件循环中调用）"""
+        self._purge()
+        task["_events"] = TaskEvents(asyncio.get_running_loop())
+        self._tasks[task_id] = task
+        return task
+
+    def alias(self, task_id: str, target_id: str) -> dict | None:
+        """让 task_id 共享 target_id 的任务状态（同一来源的合并任务）"""
+        task = self._tasks.get(target_id)
+        if task is None:
+            return None
+        self._tasks[task_id] = task
+        self._aliases.setdefault(target_id, []).append(task_id)
+        return task
+
+    async def get(self, task_id: str) -> dict | None:
+        """获取任务状态，内存中没有时尝试从共享状态或持久化存储加载"""
+        task = self._tasks.get(task_id)
+        if task is not None:
+            finished_at = self._finished.get(task_id)
+            if finished_at is not None and self._expired(finished_at):
+                self._drop(task_id)
+                return None
+            return task
+        if get_job_backend() is None and self._disk is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, self._read, task_id)
+        if loaded is None:
+            return None
+        task, finished_at = loaded
+        if finished_at is not None:
+            self._remember(task_id, task, finished_at)
+        return task
+
+    async def finish(self, task_id: str) -> None:
+        """标记任务结束（完成或出错）：开始计算 TTL，并持久化"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+
+        now = time.time()
+        task_ids = [task_id, *self._aliases.pop(task_id, [])]
+        for tid in task_ids:
+            self._finished[tid] = now
+            self._published.pop(tid, None)
+        notify(task)
+
+        backend = get_job_backend()
+        if backend is None and self._disk is None:
+            return
+        data = self._dump(task, now, transient=False)
+
+        def persist() -> None:
+            for tid in task_ids:
+                if backend is not None:
+                    backend.save_state(self._name, tid, data)
+                if self._disk is not None:
+                    self._disk.set(tid, data)
+
+        await asyncio.get_running_loop().run_in_executor(None, persist)
+
+    async def publish_running(self) -> None:
+        """队列模式：把有变化的进行中任务状态发布到共享后端（工作进程定期调用）"""
+        backend = get_job_backend()
+        if backend is None:
+            return
+        snapshots: list[tuple[str, bytes]] = []
+        for task_id, task in list(self._tasks.items()):
+            events: TaskEvents | None = task.get("_events")
+            if task_id in self._finished or events is None:
+                continue
+            if self._published.get(task_id) == events.version:
+                continue
+            snapshots.append((task_id, self._dump(task, None, transient=True)))
+            self._published[task_id] = events.version
+        if not snapshots:
+            return
+
+        def publish() -> None:
+            for task_id, data in snapshots:
+                backend.save_state(self._name, task_id, data)
+
+        await asyncio.get_running_loop().run_in_executor(None, publish)
+
+    def _expired(self, finished_at: float) -> bool:
+        return time.time() - finished_at > settings.task_ttl_seconds
+
+    def _drop(self, task_id: str) -> None:
+        self._tasks.pop(task_id, None)
+        self._finished.pop(task_id, None)
+        self._published.pop(task_id, None)
+
+    def _purge(self) -> None:
+        """清理过期任务，超出容量时按结束先后淘汰"""
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if not self._expired(finished_at) and len(self._tasks) < settings.task_max_entries:
+                break
+            self._drop(task_id)
+
+    def _dump(self, task: dict, finished_at: float | None, transient: bool) -> bytes:
+        """压缩序列化任务，去掉内部字段；transient=False 时也去掉可由结果重建的临时字段"""
+        payload = {
+            key: _to_jsonable(value)
+            for key, value in task.items()
+            if not key.startswith("_")
+            and (transient or key not in self._transient_fields)
+        }
+        payload["finished_at"] = finished_at
+        return zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    def _parse(self, data: bytes) -> tuple[dict, float | None]:
+        task = json.loads(zlib.decompress(data))
+        finished_at = task.pop("finished_at", None)
+        if task.get("result") is not None and self._result_type is not None:
+            task["result"] = self._result_type.model_validate(task["result"])
+        if self._restore:
+            self._restore(task)
+        return task, finished_at
+
+    def _remember(self, task_id: str, task: dict, finished_at: float) -> None:
+        """把从外部加载的已结束任务放入内存"""
+        self._purge()
+        self._tasks[task_id] = task
+        self._finished[task_id] = finished_at
+
+    def _read(self, task_id: str) -> tuple[dict, float | None] | None:
+        """从共享状态或持久化存储读取任务（线程池中运行），返回 (任务, 结束时间)"""
+        return self._load_shared(task_id) or self._load(task_id)
+
+    def _load_shared(self, task_id: str) -> tuple[dict, float | None] | None:
+        """队列模式：读取其他进程发布的任务状态，进行中的任务每次重新读取"""
+        backend = get_job_backend()
+        if backend is None:
+            return None
+        data = backend.load_state(self._name, task_id)
+        if data is None:
+            return None
+
+        task, finished_at = self._parse(data)
+        if finished_at is not None and self._expired(finished_at):
+            return None
+        return task, finished_at
+
+    def _load(self, task_id: str) -> tuple[dict, float | None] | None:
+        if self._disk is None:
+            return None
+        data = self._disk.get(task_id)
+        if data is None:
+            return None
+
+        task, finished_at = self._parse(data)
+        if finished_at is None or self._expired(finished_at):
+            self._disk.delete(task_id)
+            return None
+
+        logger.info("从持久化存储恢复任务: %s/%s", self._name, task_id)
+        return task, finished_at
+
+
+def _to_jsonable(value: object) -> object:
+    """pydantic 模型（及其列表）转为可 JSON 序列化的结构"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, list):
+        return [_to_jsonable(item) for item in value]
+    return value
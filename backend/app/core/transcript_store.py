@@ -0,0 +1,95 @@
+"""转录存储 — 转录完成后保存在服务端，问答与笔记接口按 transcript_id 引用"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from app.config import settings
+from app.core.disk_cache import DiskCache
+from app.models.schemas import TranscriptionResult
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptStore:
+    """按内容寻址的转录存储
+
+    transcript_id 由转录内容哈希得到，相同内容只存一份。结果压缩后写入 SQLite，
+    首次引用时才解压加载，最近使用的若干份保留在内存中。线程安全。
+    """
+
+    _instance: "TranscriptStore | None" = None
+
+    def __init__(self, path: str, max_bytes: int, memory_entries: int) -> None:
+        self._disk = DiskCache(path, max_bytes)
+        self._memory: OrderedDict[str, TranscriptionResult] = OrderedDict()
+        self._memory_entries = memory_entries
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "TranscriptStore":
+        """获取转录存储实例"""
+        if cls._instance is None:
+            cls._instance = cls(
+                os.path.join(settings.temp_dir, "transcripts", "transcripts.db"),
+                settings.transcript_store_max_mb * 1024 * 1024,
+                settings.transcript_memory_entries,
+            )
+        return cls._instance
+
+    @staticmethod
+    def make_id(result: TranscriptionResult) -> str:
+        """根据转录内容计算 transcript_id"""
+        digest = hashlib.sha256(result.text.encode("utf-8"))
+        for seg in result.segments:
+            digest.update(f"\x00{seg.start:.2f}:{seg.end:.2f}".encode())
+        return digest.hexdigest()[:16]
+
+    def put(self, result: TranscriptionResult) -> str:
+        """保存转录结果，返回 transcript_id"""
+        transcript_id = self.make_id(result)
+        stored = result.model_copy(update={"transcript_id": transcript_id})
+        data = zlib.compress(stored.model_dump_json().encode("utf-8"))
+        self._disk.set(transcript_id, data)
+        self._remember(transcript_id, stored)
+        return transcript_id
+
+    def get(self, transcript_id: str) -> TranscriptionResult | None:
+        """按 transcript_id 读取转录结果，不存在时返回 None"""
+        with self._lock:
+            result = self._memory.get(transcript_id)
+            if result is not None:
+                self._memory.move_to_end(transcript_id)
+                return result
+
+        data = self._disk.get(transcript_id)
+        if data is None:
+            return None
+        result = TranscriptionResult.model_validate_json(zlib.decompress(data))
+        self._remember(transcript_id, result)
+        return result
+
+    def _remember(self, transcript_id: str, result: TranscriptionResult) -> None:
+        with self._lock:
+            self._memory[transcript_id] = result
+            self._memory.move_to_end(transcript_id)
+            while len(self._memory) > self._memory_entries:
+                self._memory.popitem(last=False)
+
+
+def get_transcript_store() -> TranscriptStore:
+    """获取转录存储的快捷方法"""
+    return TranscriptStore.get_instance()
+
+
+async def load_transcript(transcript_id: str) -> TranscriptionResult:
+    """在线程池中加载转录，不存在时抛出 LookupError"""
+    loop = asyncio.get_event_loop()
+    result = await loop.run_in_executor(None, get_transcript_store().get, transcript_id)
+    if result is None:
+        raise LookupError(f"转录不存在或已过期: {transcript_id}")
+    return result
@@ -1,8 +1,14 @@
-"""Whisper 模型客户端，懒加载单例"""
+"""Whisper 模型客户端 — 进程内模型池（预热、多副本、热切换、内存预算）"""
 
 from __future__ import annotations
 
+import gc
 import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -12,9 +18,230 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 各模型大小的常驻内存估算（MB），用于内存预算
+MODEL_MEMORY_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 900,
+    "medium": 2200,
+    "large-v1": 4500,
+    "large-v2": 4500,
+    "large-v3": 4500,
+    "turbo": 2500,
+}
+DEFAULT_MODEL_MEMORY_MB = 1500
+
+
+def _model_memory(size: str) -> int:
+    return MODEL_MEMORY_MB.get(size.removesuffix(".en"), DEFAULT_MODEL_MEMORY_MB)
+
+
+def _load_model(size: str, **kwargs) -> WhisperModel:
+    """加载模型并用一秒静音跑一次推理预热"""
+    import numpy as np
+    from faster_whisper import WhisperModel
+
+    start = time.perf_counter()
+    model = WhisperModel(size, device="auto", compute_type="auto", **kwargs)
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+    list(segments)
+    logger.info("Whisper 模型已加载并预热: %s (%.1f 秒)", size, time.perf_counter() - start)
+    return model
+
+
+@dataclass
+class _Replica:
+    size: str
+    model: WhisperModel
+    last_used: float
+    busy: bool = True
+
+
+class WhisperModelPool:
+    """进程内 Whisper 模型池
+
+    每个模型大小最多 whisper_replicas 个副本，并发任务各自独占一个副本；
+    副本都在使用时新任务等待归还。切换 whisper_model_size 后新任务使用新模型，
+    进行中的任务继续使用旧模型，归还后旧模型才释放（热切换）。
+    配置 whisper_memory_budget_mb 时，加载新副本前按最近最少使用淘汰空闲副本。
+    """
+
+    _replicas: list[_Replica] = []
+    _loading: dict[str, int] = {}
+    _cond = threading.Condition()
+
+    @classmethod
+    @contextmanager
+    def acquire(cls, size: str | None = None) -> Iterator[WhisperModel]:
+        """独占一个模型副本，退出时归还"""
+        replica = cls._checkout(size or settings.whisper_model_size)
+        try:
+            yield replica.model
+        finally:
+            cls._checkin(replica)
+
+    @classmethod
+    def preload(cls, sizes: list[str] | None = None) -> None:
+        """按配置预加载并预热模型（阻塞，加载失败只记录日志）"""
+        sizes = sizes or cls._configured_sizes()
+        for size in sizes:
+            replicas: list[_Replica] = []
+            try:
+                for _ in range(max(1, settings.whisper_replicas)):
+                    if not cls._has_room(size) and replicas:
+                        logger.info("内存预算不足，%s 只预加载 %d 个副本", size, len(replicas))
+                        break
+                    # 不等待：副本已满或都被任务占用时停止，避免持有副本时互相等待
+                    replica = cls._checkout(size, wait=False)
+                    if replica is None:
+                        break
+                    replicas.append(replica)
+            except Exception as e:
+                logger.error("预加载 Whisper 模型失败: %s - %s", size, e)
+            finally:
+                for replica in replicas:
+                    cls._checkin(replica)
+
+    @classmethod
+    def preload_in_background(cls, sizes: list[str] | None = None) -> None:
+        """在后台线程中预加载，不阻塞启动；首个任务会等待加载中的副本而不是重复加载"""
+        threading.Thread(
+            target=cls.preload, args=(sizes,), name="whisper-preload", daemon=True
+        ).start()
+
+    @classmethod
+    def swap(cls, size: str) -> None:
+        """切换模型大小：释放旧模型的空闲副本，后台预热新模型，不影响进行中的任务"""
+        with cls._cond:
+            cls._evict_stale()
+        cls.preload_in_background([size])
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._cond:
+            replicas = [
+                {
+                    "size": r.size,
+                    "busy": r.busy,
+                    "idle_seconds": 0 if r.busy else round(time.time() - r.last_used, 1),
+                    "memory_mb": _model_memory(r.size),
+                }
+                for r in cls._replicas
+            ]
+            return {
+                "replicas": replicas,
+                "loading": {size: n for size, n in cls._loading.items() if n},
+                "memory_mb": sum(r["memory_mb"] for r in replicas),
+                "memory_budget_mb": settings.whisper_memory_budget_mb,
+            }
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """释放全部空闲副本"""
+        with cls._cond:
+            cls._replicas = [r for r in cls._replicas if r.busy]
+        gc.collect()
+
+    @classmethod
+    def _configured_sizes(cls) -> list[str]:
+        sizes = [settings.whisper_model_size]
+        for size in settings.whisper_preload_sizes.split(","):
+            size = size.strip()
+            if size and size not in sizes:
+                sizes.append(size)
+        return sizes
+
+    @classmethod
+    def _checkout(cls, size: str, wait: bool = True) -> _Replica | None:
+        """借出一个空闲副本，没有时在预算和副本数允许的情况下加载新副本
+
+        wait=False 时无法立即借出或加载则返回 None。
+        """
+        with cls._cond:
+            while True:
+                for replica in cls._replicas:
+                    if replica.size == size and not replica.busy:
+                        replica.busy = True
+                        return replica
+                count = sum(r.size == size for r in cls._replicas) + cls._loading.get(size, 0)
+                if count < max(1, settings.whisper_replicas) and cls._make_room(size, count == 0):
+                    cls._loading[size] = cls._loading.get(size, 0) + 1
+                    break
+                if not wait:
+                    return None
+                cls._cond.wait()
+
+        # 在锁外加载，不阻塞其他模型的借还
+        try:
+            logger.info("加载 Whisper 模型: %s ...", size)
+            model = _load_model(size)
+        finally:
+            with cls._cond:
+                cls._loading[size] -= 1
+                cls._cond.notify_all()
+
+        replica = _Replica(size, model, time.time())
+        with cls._cond:
+            cls._replicas.append(replica)
+        return replica
+
+    @classmethod
+    def _checkin(cls, replica: _Replica) -> None:
+        with cls._cond:
+            replica.busy = False
+            replica.last_used = time.time()
+            cls._evict_stale()
+            cls._cond.notify_all()
+
+    @classmethod
+    def _evict_stale(cls) -> None:
+        """释放已不在配置中的模型的空闲副本（需持有锁）"""
+        configured = set(cls._configured_sizes())
+        stale = [r for r in cls._replicas if not r.busy and r.size not in configured]
+        for replica in stale:
+            cls._evict(replica)
+
+    @classmethod
+    def _used_memory(cls) -> int:
+        loading = sum(_model_memory(size) * n for size, n in cls._loading.items())
+        return sum(_model_memory(r.size) for r in cls._replicas) + loading
+
+    @classmethod
+    def _has_room(cls, size: str) -> bool:
+        budget = settings.whisper_memory_budget_mb
+        with cls._cond:
+            return budget <= 0 or cls._used_memory() + _model_memory(size) <= budget
+
+    @classmethod
+    def _make_room(cls, size: str, force: bool) -> bool:
+        """为新副本腾出内存预算（需持有锁）
+
+        按最近最少使用淘汰空闲副本；仍不够时，若该大小还没有任何副本则超预算加载
+        （避免永远等待），否则返回 False 等待其他副本归还。
+        """
+        budget = settings.whisper_memory_budget_mb
+        if budget <= 0:
+            return True
+        needed = _model_memory(size)
+        idle = sorted((r for r in cls._replicas if not r.busy), key=lambda r: r.last_used)
+        while cls._used_memory() + needed > budget and idle:
+            cls._evict(idle.pop(0))
+        if cls._used_memory() + needed <= budget:
+            return True
+        if force:
+            logger.warning("Whisper 模型超出内存预算加载: %s", size)
+        return force
+
+    @classmethod
+    def _evict(cls, replica: _Replica) -> None:
+        cls._replicas.remove(replica)
+        replica.model = None
+        gc.collect()
+        logger.info("释放 Whisper 模型副本: %s", replica.size)
+
 
 class WhisperClient:
-    """Whisper 模型管理器，首次使用时才加载模型"""
+    """单模型管理器，首次使用时才加载模型（并行转录的工作进程各持有一份）"""
 
     _model: WhisperModel | None = None
     _model_size: str = ""
@@ -45,6 +272,40 @@ class WhisperClient:
         cls._model_size = ""
 
 
+class STTWhisperClient:
+    """语音提问用的小型 Whisper 模型，与长视频转录的模型相互独立
+
+    在 stt 类别的线程池中调用，加载加锁：并发的首批请求只加载一次模型。
+    """
+
+    _model: WhisperModel | None = None
+    _model_size: str = ""
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls) -> WhisperModel:
+        """获取本地语音识别模型实例"""
+        target_size = settings.stt_local_model_size
+        model = cls._model
+        if model is not None and cls._model_size == target_size:
+            return model
+
+        with cls._lock:
+            if cls._model is None or cls._model_size != target_size:
+                logger.info("加载本地语音识别模型: %s ...", target_size)
+                from faster_whisper import WhisperModel
+
+                cls._model = WhisperModel(
+                    target_size,
+                    device="auto",
+                    compute_type="auto",
+                    cpu_threads=settings.stt_cpu_threads,
+                )
+                cls._model_size = target_size
+                logger.info("本地语音识别模型加载完成")
+            return cls._model
+
+
 def get_whisper_model() -> WhisperModel:
-    """获取 Whisper 模型的快捷方法"""
+    """获取 Whisper 模型的快捷方法（单模型，供转录工作进程使用）"""
     return WhisperClient.get_model()
@@ -0,0 +1,73 @@
+"""Whisper 转录进程池 — 每个工作进程持有独立的 WhisperModel"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from app.config import settings
+from app.core.whisper_client import WhisperClient
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(model_size: str) -> None:
+    """工作进程初始化：固定模型大小并预加载模型"""
+    settings.whisper_model_size = model_size
+    WhisperClient.get_model()
+
+
+def transcribe_window(
+    audio: np.ndarray,
+    language: str | None = None,
+) -> tuple[list[tuple[float, float, str]], str | None]:
+    """在工作进程中转录一个音频窗口，返回 (窗口内片段, 检测到的语言)"""
+    model = WhisperClient.get_model()
+    segments_raw, info = model.transcribe(
+        audio,
+        beam_size=5,
+        vad_filter=True,
+        language=language,
+    )
+    segments = [(seg.start, seg.end, seg.text.strip()) for seg in segments_raw]
+    return segments, info.language
+
+
+class WhisperProcessPool:
+    """转录进程池管理器，模型大小或进程数变化时重建"""
+
+    _pool: ProcessPoolExecutor | None = None
+    _key: tuple[str, int] = ("", 0)
+
+    @classmethod
+    def get_pool(cls) -> ProcessPoolExecutor:
+        """获取进程池实例"""
+        key = (settings.whisper_model_size, settings.whisper_parallel_workers)
+
+        if cls._pool is None or cls._key != key:
+            if cls._pool is not None:
+                # 旧进程池处理完已提交的窗口后自行退出，不影响进行中的任务
+                cls._pool.shutdown(wait=False)
+            logger.info("启动 Whisper 进程池: %s x %d", key[0], key[1])
+            cls._pool = ProcessPoolExecutor(
+                max_workers=key[1],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(key[0],),
+            )
+            cls._key = key
+
+        return cls._pool
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭进程池（不等待进行中的窗口）"""
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+        cls._pool = None
+        cls._key = ("", 0)
@@ -1,11 +1,19 @@
 """VideoNote 后端 - FastAPI 应用入口"""
 
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import settings as config
+from app.core.http_client import HTTPClient
+from app.core.job_queue import get_job_backend
+from app.core.scheduler import Scheduler
+from app.core.storage import get_storage_manager
+from app.core.whisper_client import WhisperModelPool
+from app.core.whisper_workers import WhisperProcessPool
 from app.routers import video, transcribe, note, qa, download, settings, tts, stt
 
 
@@ -14,8 +22,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """应用生命周期管理"""
     # 启动时
     print("🚀 VideoNote 后端启动中...")
+    get_storage_manager().cleanup()
+    stt.stt_service.warm_up()
+    # 队列模式下转录在工作进程中执行，由工作进程预加载模型
+    if config.whisper_preload and get_job_backend() is None:
+        WhisperModelPool.preload_in_background()
     yield
     # 关闭时
+    WhisperProcessPool.shutdown()
+    WhisperModelPool.shutdown()
+    await HTTPClient.close()
     print("👋 VideoNote 后端已关闭")
 
 
@@ -50,3 +66,16 @@ app.include_router(stt.router, prefix="/api/stt", tags=["语音识别"])
 async def health_check() -> dict[str, str]:
     """健康检查"""
     return {"status": "ok", "service": "videonote-backend"}
+
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats() -> dict:
+    """各任务类别的并发与排队情况，以及 Whisper 模型池状态"""
+    return {**Scheduler.stats(), "whisper_models": WhisperModelPool.stats()}
+
+
+@app.get("/api/storage/stats")
+async def storage_stats() -> dict:
+    """临时存储占用：中间文件、下载存储、缓存，以及配额"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, get_storage_manager().stats)
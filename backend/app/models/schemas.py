@@ -18,9 +18,16 @@ class TranscribeRequest(BaseModel):
     local_path: str | None = None
 
 
+class BatchTranscribeRequest(BaseModel):
+    """批量转录请求（播放列表、频道或合集）"""
+    url: str
+    max_items: int | None = None  # 最多转录的条目数，为空时使用配置上限
+
+
 class NoteGenerateRequest(BaseModel):
-    """笔记生成请求"""
-    transcription_text: str
+    """笔记生成请求（transcription_text 与 transcript_id 二选一）"""
+    transcription_text: str | None = None
+    transcript_id: str | None = None
     language: str = "zh"
 
 
@@ -29,11 +36,15 @@ class QARequest(BaseModel):
     video_url: str
     question: str
     context: str | None = None
+    transcript_id: str | None = None  # 服务端保存的转录，优先于 context / segments
+    segments: list["TranscriptionSegment"] | None = None  # 带时间戳的转录片段，长视频检索时使用
+    session_id: str | None = None  # 多轮问答会话，为空时新建
 
 
 class TTSRequest(BaseModel):
     text: str
     speed: float | None = None
+    stream: bool = False  # 边合成边返回音频，长文本首段音频更快
 
 
 class DownloadRequest(BaseModel):
@@ -68,6 +79,31 @@ class TranscriptionResult(BaseModel):
     segments: list[TranscriptionSegment]
     language: str
     duration: float
+    transcript_id: str | None = None  # 服务端转录存储 ID，问答/笔记请求可直接引用
+    source: str = "whisper"  # whisper / subtitles（平台人工字幕）/ auto_captions（平台自动字幕）
+
+
+class BatchItem(BaseModel):
+    """批量转录中的单个条目"""
+    index: int
+    url: str
+    title: str
+    duration: int = 0
+    status: str = "pending"  # pending / processing / completed / error
+    progress: int = 0
+    queue_position: int = 0
+    task_id: str | None = None
+    transcript_id: str | None = None
+    cached: bool = False
+    error: str | None = None
+
+
+class BatchResult(BaseModel):
+    """批量转录结果索引：各条目的转录 ID，可逐个获取转录或用于问答/笔记"""
+    batch_id: str
+    title: str
+    source: str
+    items: list[BatchItem]
 
 
 class NoteResult(BaseModel):
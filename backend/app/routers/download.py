@@ -1,11 +1,20 @@
 """视频下载路由"""
 
+import asyncio
 import json
+import mimetypes
+import os
+
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from app.config import settings
+from app.core.download_store import get_download_store
+from app.core.scheduler import SchedulerFull
 from app.models.schemas import DownloadRequest, TaskResponse
 from app.services.download_service import DownloadService
+from app.utils.file_response import RangedFileResponse
 
 router = APIRouter()
 download_service = DownloadService()
@@ -21,6 +30,8 @@ async def start_download(request: DownloadRequest) -> TaskResponse:
             quality=request.quality,
         )
         return TaskResponse(task_id=task_id, status="processing", message="下载已开始")
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -40,10 +51,40 @@ async def download_progress(task_id: str) -> StreamingResponse:
     )
 
 
-@router.get("/file/{task_id}")
-async def download_file(task_id: str) -> FileResponse:
-    """下载已完成的文件"""
-    file_path = await download_service.get_file_path(task_id)
-    if file_path is None:
+@router.get("/store/stats")
+async def download_store_stats() -> dict:
+    """下载存储占用统计"""
+    return await download_service.get_store_stats()
+
+
+@router.api_route("/file/{task_id}", methods=["GET", "HEAD"])
+async def download_file(task_id: str) -> RangedFileResponse:
+    """下载已完成的文件：支持 Range 断点续传与拖动播放、ETag/Last-Modified 条件请求
+
+    传输期间文件不会被存储淘汰；配置 download_accel_redirect 时由前置 nginx 发送文件。
+    """
+    found = await download_service.get_file(task_id)
+    if found is None:
         raise HTTPException(status_code=404, detail="文件不存在或下载未完成")
-    return FileResponse(file_path)
+    file_path, filename, artifact_key = found
+    store = get_download_store()
+
+    accel_redirect = None
+    if settings.download_accel_redirect:
+        relative = os.path.relpath(file_path, store.root).replace(os.sep, "/")
+        accel_redirect = f"{settings.download_accel_redirect.rstrip('/')}/{relative}"
+
+    # 持有引用后再确认文件仍在：其他进程可能刚好在此之前淘汰了它
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, store.acquire, artifact_key)
+    if not os.path.isfile(file_path):
+        await loop.run_in_executor(None, store.release, artifact_key)
+        raise HTTPException(status_code=404, detail="文件不存在或下载未完成")
+    return RangedFileResponse(
+        file_path,
+        filename=filename,
+        media_type=mimetypes.guess_type(file_path)[0],
+        background=BackgroundTask(store.release, artifact_key),
+        chunk_size=settings.download_chunk_kb * 1024,
+        accel_redirect=accel_redirect,
+    )
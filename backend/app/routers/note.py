@@ -14,12 +14,17 @@ note_service = NoteService()
 @router.post("/generate", response_model=TaskResponse)
 async def generate_note(request: NoteGenerateRequest) -> TaskResponse:
     """生成笔记"""
+    if not request.transcription_text and not request.transcript_id:
+        raise HTTPException(status_code=400, detail="请提供转录文本或 transcript_id")
     try:
         task_id = await note_service.generate(
             text=request.transcription_text,
             language=request.language,
+            transcript_id=request.transcript_id,
         )
         return TaskResponse(task_id=task_id, status="processing", message="笔记生成中")
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -35,6 +40,12 @@ async def stream_note(task_id: str) -> StreamingResponse:
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
+@router.get("/cache/stats")
+async def note_cache_stats() -> dict:
+    """笔记缓存命中统计"""
+    return await note_service.get_cache_stats()
+
+
 @router.get("/result/{task_id}", response_model=NoteResult)
 async def get_note_result(task_id: str) -> NoteResult:
     """获取笔记结果"""
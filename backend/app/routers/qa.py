@@ -13,17 +13,19 @@ qa_service = QAService()
 
 @router.post("/ask")
 async def ask_question(request: QARequest) -> StreamingResponse:
-    """基于视频内容回答问题（流式响应）"""
+    """基于视频内容回答问题（流式响应），传 session_id 继续多轮对话"""
 
     async def event_stream():
         try:
-            async for chunk in qa_service.ask(
+            async for event in qa_service.ask(
                 question=request.question,
                 context=request.context or "",
                 video_url=request.video_url,
+                segments=request.segments,
+                transcript_id=request.transcript_id,
+                session_id=request.session_id,
             ):
-                yield f"data: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
-            yield f"data: {json.dumps({'status': 'completed'})}\n\n"
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'status': 'error', 'message': str(e)})}\n\n"
 
@@ -32,3 +34,26 @@ async def ask_question(request: QARequest) -> StreamingResponse:
         media_type="text/event-stream",
         headers={"Content-Type": "text/event-stream; charset=utf-8"},
     )
+
+
+@router.get("/stats")
+async def qa_stats() -> dict:
+    """问答 token 用量统计（含命中提示缓存的输入 token）"""
+    return qa_service.get_stats()
+
+
+@router.get("/sessions/{session_id}")
+async def qa_session_metrics(session_id: str) -> dict:
+    """会话逐轮 token 用量"""
+    metrics = qa_service.get_session_metrics(session_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+    return metrics
+
+
+@router.delete("/sessions/{session_id}")
+async def close_qa_session(session_id: str) -> dict:
+    """结束会话"""
+    if not qa_service.close_session(session_id):
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+    return {"status": "closed"}
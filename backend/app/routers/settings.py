@@ -3,6 +3,7 @@ from pydantic import BaseModel
 
 from app.config import settings
 from app.core.ai_client import AIClient
+from app.core.whisper_client import WhisperModelPool
 
 router = APIRouter()
 
@@ -44,8 +45,10 @@ async def update_settings(data: SettingsData) -> dict:
         changed = True
     if data.openai_model:
         settings.openai_model = data.openai_model
-    if data.whisper_model_size:
+    if data.whisper_model_size and data.whisper_model_size != settings.whisper_model_size:
+        # 进行中的转录继续使用旧模型，新模型在后台预热
         settings.whisper_model_size = data.whisper_model_size
+        WhisperModelPool.swap(data.whisper_model_size)
     if data.youtube_api_key and "*" not in data.youtube_api_key:
         settings.youtube_api_key = data.youtube_api_key
 
@@ -1,8 +1,9 @@
 """STT 语音识别路由"""
 
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, File, HTTPException, UploadFile
 from pydantic import BaseModel
 
+from app.core.scheduler import SchedulerFull
 from app.services.stt_service import STTService
 
 router = APIRouter()
@@ -16,8 +17,11 @@ class STTResponse(BaseModel):
 @router.post("/transcribe", response_model=STTResponse)
 async def speech_to_text(file: UploadFile = File(...)) -> STTResponse:
     audio_data = await file.read()
-    text = await stt_service.transcribe(
-        audio_data=audio_data,
-        filename=file.filename or "audio.webm",
-    )
+    try:
+        text = await stt_service.transcribe(
+            audio_data=audio_data,
+            filename=file.filename or "audio.webm",
+        )
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     return STTResponse(text=text)
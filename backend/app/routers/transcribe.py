@@ -1,14 +1,23 @@
 """转录路由"""
 
 import json
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from fastapi.responses import StreamingResponse
 
-from app.models.schemas import TranscribeRequest, TranscriptionResult, TaskResponse
+from app.core.scheduler import SchedulerFull
+from app.models.schemas import (
+    BatchResult,
+    BatchTranscribeRequest,
+    TaskResponse,
+    TranscribeRequest,
+    TranscriptionResult,
+)
+from app.services.batch_service import BatchService
 from app.services.transcribe_service import TranscribeService
 
 router = APIRouter()
 transcribe_service = TranscribeService()
+batch_service = BatchService()
 
 
 @router.post("/start", response_model=TaskResponse)
@@ -22,17 +31,26 @@ async def start_transcription(request: TranscribeRequest) -> TaskResponse:
             local_path=request.local_path,
         )
         return TaskResponse(task_id=task_id, status="processing", message="转录已开始")
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/progress/{task_id}")
-async def transcription_progress(task_id: str) -> StreamingResponse:
-    """SSE 实时推送转录进度"""
+async def transcription_progress(
+    task_id: str,
+    cursor: int = 0,
+    last_event_id: str | None = Header(default=None),
+) -> StreamingResponse:
+    """SSE 实时推送转录进度和增量片段，支持 cursor / Last-Event-ID 断点续传"""
+    if last_event_id and last_event_id.isdigit():
+        cursor = max(cursor, int(last_event_id))
 
     async def event_stream():
-        async for progress in transcribe_service.get_progress(task_id):
-            yield f"data: {json.dumps(progress, ensure_ascii=False)}\n\n"
+        async for progress in transcribe_service.get_progress(task_id, cursor):
+            data = json.dumps(progress, ensure_ascii=False)
+            yield f"id: {progress.get('cursor', 0)}\ndata: {data}\n\n"
 
     return StreamingResponse(
         event_stream(),
@@ -41,6 +59,12 @@ async def transcription_progress(task_id: str) -> StreamingResponse:
     )
 
 
+@router.get("/cache/stats")
+async def transcription_cache_stats() -> dict:
+    """转录缓存命中统计"""
+    return await transcribe_service.get_cache_stats()
+
+
 @router.get("/result/{task_id}", response_model=TranscriptionResult)
 async def get_transcription_result(task_id: str) -> TranscriptionResult:
     """获取转录结果"""
@@ -48,3 +72,48 @@ async def get_transcription_result(task_id: str) -> TranscriptionResult:
     if result is None:
         raise HTTPException(status_code=404, detail="任务不存在或未完成")
     return result
+
+
+@router.get("/transcript/{transcript_id}", response_model=TranscriptionResult)
+async def get_transcript(transcript_id: str) -> TranscriptionResult:
+    """按 transcript_id 获取服务端保存的转录"""
+    result = await transcribe_service.get_transcript(transcript_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="转录不存在或已过期")
+    return result
+
+
+@router.post("/batch/start", response_model=TaskResponse)
+async def start_batch_transcription(request: BatchTranscribeRequest) -> TaskResponse:
+    """展开播放列表/频道并开始批量转录"""
+    try:
+        batch_id = await batch_service.start(url=request.url, max_items=request.max_items)
+        return TaskResponse(task_id=batch_id, status="processing", message="批量转录已开始")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batch/progress/{batch_id}")
+async def batch_transcription_progress(batch_id: str) -> StreamingResponse:
+    """SSE 推送批量转录的总进度和各条目进度"""
+
+    async def event_stream():
+        async for progress in batch_service.get_progress(batch_id):
+            yield f"data: {json.dumps(progress, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Content-Type": "text/event-stream; charset=utf-8"},
+    )
+
+
+@router.get("/batch/result/{batch_id}", response_model=BatchResult)
+async def get_batch_result(batch_id: str) -> BatchResult:
+    """获取批量转录结果索引"""
+    result = await batch_service.get_result(batch_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="任务不存在或未完成")
+    return result
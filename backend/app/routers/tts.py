@@ -1,8 +1,10 @@
 """TTS 语音合成路由"""
 
-from fastapi import APIRouter
-from fastapi.responses import Response
+import httpx
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
 
+from app.config import settings
 from app.models.schemas import TTSRequest
 from app.services.tts_service import TTSService
 
@@ -12,12 +14,41 @@ tts_service = TTSService()
 
 @router.post("/speak")
 async def text_to_speech(request: TTSRequest) -> Response:
-    audio_bytes = await tts_service.synthesize(
-        text=request.text,
-        speed=request.speed,
-    )
+    """合成语音；stream=true 时边合成边返回，长文本按句流水线合成，缩短首段音频的等待时间"""
+    try:
+        if request.stream:
+            synthesize = (
+                tts_service.synthesize_sentences
+                if len(request.text) > settings.tts_segment_chars
+                else tts_service.synthesize_stream
+            )
+            audio = await synthesize(text=request.text, speed=request.speed)
+            return StreamingResponse(
+                audio,
+                media_type="audio/mpeg",
+                headers={"Content-Disposition": "inline"},
+            )
+
+        audio_bytes = await tts_service.synthesize(
+            text=request.text,
+            speed=request.speed,
+        )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"语音合成失败: {e.response.status_code}")
+    except httpx.TransportError as e:
+        # 连接失败、超时等：首个音频字节发出前返回 502，之后的中断由服务层中止响应
+        raise HTTPException(status_code=502, detail=f"语音合成服务连接失败: {e!r}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     return Response(
         content=audio_bytes,
         media_type="audio/mpeg",
         headers={"Content-Disposition": "inline"},
     )
+
+
+@router.get("/cache/stats")
+async def tts_cache_stats() -> dict:
+    """语音缓存命中统计"""
+    return await tts_service.get_cache_stats()
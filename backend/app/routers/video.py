@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, HTTPException
 
+from app.core.scheduler import SchedulerFull
 from app.models.schemas import VideoPreviewRequest, VideoInfo
 from app.services.video_service import VideoService
 
@@ -14,5 +15,7 @@ async def preview_video(request: VideoPreviewRequest) -> VideoInfo:
     """获取视频信息（标题、封面、时长、平台）"""
     try:
         return await video_service.get_video_info(request.url)
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
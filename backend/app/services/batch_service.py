@@ -0,0 +1,185 @@
+"""批量转录服务 — 展开播放列表/频道，按有限并发分发给转录任务"""
+
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncGenerator
+
+from app.config import settings
+from app.core.scheduler import PRIORITY_BATCH, SchedulerFull
+from app.core.task_store import TaskStore, notify, wait_for_change
+from app.models.schemas import BatchItem, BatchResult
+from app.services.transcribe_service import TranscribeService
+from app.services.video_service import VideoService
+
+logger = logging.getLogger(__name__)
+
+_tasks = TaskStore("batch", BatchResult)
+
+# 转录排队已满时，条目等待后重新提交
+_ADMIT_RETRY_SECONDS = 5.0
+
+
+class BatchService:
+    """批量转录服务
+
+    播放列表只展开一次；每个条目复用单视频转录流程（缓存、合并、调度器排队），
+    以批量优先级提交，交互式请求仍然优先执行。已有缓存的条目直接记录结果，不创建任务。
+    """
+
+    def __init__(self) -> None:
+        self._video_service = VideoService()
+        self._transcribe_service = TranscribeService()
+
+    async def start(self, url: str, max_items: int | None = None) -> str:
+        """展开播放列表并开始批量转录，返回 batch_id"""
+        limit = min(max_items or settings.batch_max_items, settings.batch_max_items)
+        title, entries = await self._video_service.get_playlist_entries(url, limit)
+        if not entries:
+            raise ValueError("播放列表中没有可转录的视频")
+
+        batch_id = str(uuid.uuid4())[:8]
+        task = {
+            "status": "processing",
+            "progress": 0,
+            "source": url,
+            "title": title,
+            "items": [
+                BatchItem(index=i, **entry).model_dump() for i, entry in enumerate(entries)
+            ],
+            "result": None,
+        }
+        _tasks.create(batch_id, task)
+        asyncio.create_task(self._run_batch(batch_id))
+
+        logger.info("批量转录任务已创建: %s (%d 项)", batch_id, len(entries))
+        return batch_id
+
+    async def _run_batch(self, batch_id: str) -> None:
+        task = await _tasks.get(batch_id)
+        if not task:
+            return
+
+        semaphore = asyncio.Semaphore(max(1, settings.batch_concurrency))
+        try:
+            await asyncio.gather(
+                *(self._run_item(task, item, semaphore) for item in task["items"])
+            )
+            failed = sum(item["status"] == "error" for item in task["items"])
+            task["progress"] = 100
+            task["status"] = "error" if failed == len(task["items"]) else "completed"
+            if task["status"] == "error":
+                task["error"] = "全部条目转录失败"
+            task["result"] = BatchResult(
+                batch_id=batch_id,
+                title=task["title"],
+                source=task["source"],
+                items=[BatchItem.model_validate(item) for item in task["items"]],
+            )
+            logger.info(
+                "批量转录完成: %s (%d 项, 失败 %d)", batch_id, len(task["items"]), failed
+            )
+
+        except Exception as e:
+            logger.error("批量转录失败: %s - %s", batch_id, e)
+            task["status"] = "error"
+            task["error"] = str(e)
+
+        finally:
+            await _tasks.finish(batch_id)
+
+    async def _run_item(self, task: dict, item: dict, semaphore: asyncio.Semaphore) -> None:
+        """转录单个条目，失败只记录在条目上，不影响其他条目"""
+        async with semaphore:
+            try:
+                cached = await self._transcribe_service.get_cached(item["url"])
+                if cached is not None:
+                    item.update(
+                        status="completed",
+                        progress=100,
+                        cached=True,
+                        transcript_id=cached.transcript_id,
+                    )
+                    return
+
+                item["status"] = "processing"
+                item["task_id"] = await self._submit(item["url"])
+                self._update(task)
+
+                async for progress in self._transcribe_service.get_progress(item["task_id"]):
+                    item["progress"] = progress["progress"]
+                    item["queue_position"] = progress.get("queue_position", 0)
+                    if progress["status"] == "error":
+                        raise RuntimeError(progress["message"])
+                    self._update(task)
+
+                result = await self._transcribe_service.get_result(item["task_id"])
+                if result is None:
+                    raise RuntimeError("转录结果不可用")
+                item.update(status="completed", progress=100, transcript_id=result.transcript_id)
+
+            except Exception as e:
+                logger.warning("批量转录条目失败: %s - %s", item["url"], e)
+                item.update(status="error", error=str(e))
+
+            finally:
+                item["queue_position"] = 0
+                self._update(task)
+
+    async def _submit(self, url: str) -> str:
+        """以批量优先级提交转录，排队已满时等待后重试"""
+        while True:
+            try:
+                return await self._transcribe_service.start(url=url, priority=PRIORITY_BATCH)
+            except SchedulerFull:
+                await asyncio.sleep(_ADMIT_RETRY_SECONDS)
+
+    def _update(self, task: dict) -> None:
+        """按各条目进度汇总总进度并通知订阅者（失败的条目按已结束计）"""
+        items = task["items"]
+        done = sum(100 if item["status"] == "error" else item["progress"] for item in items)
+        task["progress"] = min(99, done // len(items))
+        notify(task)
+
+    async def get_progress(self, batch_id: str) -> AsyncGenerator[dict, None]:
+        """SSE 推送批量进度：总进度与计数，以及自上次推送后有变化的条目"""
+        version = 0
+        sent: dict[int, dict] = {}
+        while True:
+            task = await _tasks.get(batch_id)
+            if not task:
+                yield {"status": "error", "message": "任务不存在", "progress": 0}
+                return
+
+            items = task["items"]
+            completed = sum(item["status"] == "completed" for item in items)
+            failed = sum(item["status"] == "error" for item in items)
+            changed = [item for item in items if sent.get(item["index"]) != item]
+            for item in changed:
+                sent[item["index"]] = dict(item)
+
+            msg = f"已完成 {completed}/{len(items)}"
+            if failed:
+                msg += f"，失败 {failed}"
+            yield {
+                "status": task["status"],
+                "progress": task["progress"],
+                "message": task.get("error") or msg,
+                "total": len(items),
+                "completed": completed,
+                "failed": failed,
+                "cached": sum(item["cached"] for item in items),
+                "items": [dict(item) for item in changed],
+            }
+
+            if task["status"] in ("completed", "error"):
+                return
+
+            version = await wait_for_change(task, version)
+
+    async def get_result(self, batch_id: str) -> BatchResult | None:
+        """获取批量转录结果索引"""
+        task = await _tasks.get(batch_id)
+        if not task or task["result"] is None:
+            return None
+        return task["result"]
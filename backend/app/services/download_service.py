@@ -1,30 +1,43 @@
-"""视频下载服务 — 使用 yt-dlp 下载视频"""
+"""视频下载服务 — 使用 yt-dlp 下载视频，文件保存在按内容去重的下载存储中"""
 
 import asyncio
 import logging
 import os
+import re
 import uuid
 from collections.abc import AsyncGenerator
-from concurrent.futures import ThreadPoolExecutor
 
 import yt_dlp
 
-from app.config import settings
-from app.utils.ytdlp import build_ydl_opts
+from app.core.download_store import get_download_store
+from app.core.job_queue import get_job_backend
+from app.core.scheduler import get_lane
+from app.core.storage import get_storage_manager
+from app.core.task_store import TaskStore, notify, queue_reporter, wait_for_change
+from app.services.video_service import VideoService
+from app.utils.audio import transcode_to_mp3
+from app.utils.ytdlp import build_ydl_opts, process_info
 
 logger = logging.getLogger(__name__)
 
-_executor = ThreadPoolExecutor(max_workers=2)
-_tasks: dict[str, dict] = {}
+_tasks = TaskStore("download")
+# 进行中的下载：存储键 -> 负责执行的 task_id
+_inflight: dict[str, str] = {}
+
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
 
 
 class DownloadService:
     """视频下载服务"""
 
+    def __init__(self) -> None:
+        self._video_service = VideoService()
+
     def _build_ydl_opts(
-        self, task_id: str, task: dict, url: str, output_dir: str, fmt: str, quality: str
+        self, task: dict, url: str, output_dir: str, fmt: str, quality: str
     ) -> dict:
-        output_path = os.path.join(output_dir, f"{task_id}.%(ext)s")
+        # 固定文件名：同一存储键中断后重新下载时，yt-dlp 从 .part 文件续传
+        output_path = os.path.join(output_dir, "media.%(ext)s")
 
         quality_map = {
             "best": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
@@ -35,6 +48,7 @@ class DownloadService:
 
         extra: dict = {
             "outtmpl": output_path,
+            "continuedl": True,
             "progress_hooks": [lambda d: self._progress_hook(d, task)],
         }
 
@@ -54,71 +68,131 @@ class DownloadService:
 
     def _progress_hook(self, d: dict, task: dict) -> None:
         """yt-dlp 下载进度回调"""
+        progress = task["progress"]
         if d["status"] == "downloading":
             total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
             downloaded = d.get("downloaded_bytes", 0)
             if total > 0:
-                task["progress"] = min(95, int((downloaded / total) * 95))
+                progress = min(95, int((downloaded / total) * 95))
         elif d["status"] == "finished":
-            task["progress"] = 95
+            progress = 95
+
+        # 回调非常频繁，只在百分比变化时通知订阅者
+        if progress != task["progress"]:
+            task["progress"] = progress
+            notify(task)
 
     def _download_sync(
-        self, task_id: str, task: dict, url: str, fmt: str, quality: str
+        self,
+        task: dict,
+        url: str,
+        fmt: str,
+        quality: str,
+        output_dir: str,
+        info: dict | None = None,
     ) -> str:
-        """同步下载（线程池中运行）"""
-        output_dir = os.path.join(settings.temp_dir, "downloads")
-        os.makedirs(output_dir, exist_ok=True)
-
-        opts = self._build_ydl_opts(task_id, task, url, output_dir, fmt, quality)
+        """同步下载（线程池中运行），返回 yt-dlp 报告的最终文件路径"""
+        opts = self._build_ydl_opts(task, url, output_dir, fmt, quality)
 
         with yt_dlp.YoutubeDL(opts) as ydl:
-            ydl.download([url])
-
-        # 找到下载的文件
-        for f in os.listdir(output_dir):
-            if f.startswith(task_id):
-                return os.path.join(output_dir, f)
+            result = process_info(ydl, url, info, download=True)
 
-        raise FileNotFoundError("下载文件未找到")
+        downloads = result.get("requested_downloads") or []
+        file_path = downloads[-1].get("filepath") if downloads else None
+        if not file_path or not os.path.isfile(file_path):
+            raise FileNotFoundError("下载文件未找到")
+        return file_path
 
     async def start(self, url: str, format: str = "mp4", quality: str = "best") -> str:
-        """开始下载任务，返回 task_id"""
+        """开始下载任务，返回 task_id；下载排队已满时抛出 SchedulerFull"""
         task_id = str(uuid.uuid4())[:8]
+        artifact_key = get_download_store().make_key(url, format, quality)
 
-        _tasks[task_id] = {
+        # 同一视频、格式和清晰度正在下载时共享同一个任务状态，只下载一次
+        leader_id = _inflight.get(artifact_key)
+        if leader_id is not None and _tasks.alias(task_id, leader_id) is not None:
+            logger.info("下载任务已合并: %s -> %s", task_id, leader_id)
+            return task_id
+
+        task = {
             "status": "processing",
             "progress": 0,
             "url": url,
             "format": format,
             "quality": quality,
+            "artifact_key": artifact_key,
+            "title": None,
             "file_path": None,
+            "reused": False,
+            "queue_position": 0,
         }
 
-        asyncio.create_task(self._run_download(task_id))
+        if get_job_backend() is not None:
+            leader_id = await _tasks.submit(task_id, task, {}, dedupe_key=artifact_key)
+            if leader_id != task_id:
+                logger.info("下载任务已合并: %s -> %s", task_id, leader_id)
+                return task_id
+        else:
+            lane = get_lane("download")
+            lane.admit()
+            _tasks.create(task_id, task)
+            _inflight[artifact_key] = task_id
+            job = asyncio.create_task(self._run_download(task_id))
+            job.add_done_callback(lambda _: lane.leave())
 
         logger.info("下载任务已创建: %s (%s, %s)", task_id, format, quality)
         return task_id
 
+    async def run_job(self, task_id: str, task: dict, args: dict) -> None:
+        """在队列工作进程中执行下载任务"""
+        _tasks.create(task_id, task)
+        await self._run_download(task_id, **args)
+
     async def _run_download(self, task_id: str) -> None:
         """执行下载"""
-        task = _tasks.get(task_id)
+        task = await _tasks.get(task_id)
         if not task:
             return
 
+        store = get_download_store()
+        key = task["artifact_key"]
         loop = asyncio.get_event_loop()
-
+        await loop.run_in_executor(None, store.acquire, key)
         try:
-            file_path = await loop.run_in_executor(
-                _executor,
-                self._download_sync,
-                task_id,
-                task,
-                task["url"],
-                task["format"],
-                task["quality"],
-            )
+            # 步骤 1: 已下载过相同视频、格式和清晰度时直接复用
+            found = await loop.run_in_executor(None, store.lookup, key)
+            source = None
+            if found is None and task["format"] == "mp3":
+                source = await loop.run_in_executor(None, store.find_video, task["url"])
+
+            if found is not None:
+                file_path, title = found
+                task["reused"] = True
+                logger.info("复用已下载文件: %s -> %s", task_id, key)
+            elif source is not None:
+                # 步骤 2: mp3 可以从已下载的 mp4 转码得到，不再重新下载
+                file_path, title = await self._transcode(task, key, *source)
+                task["reused"] = True
+            else:
+                # 步骤 3: 下载到存储键的固定目录（复用预览时已提取的元数据）
+                info = await self._video_service.get_info_dict(task["url"])
+                title = info.get("title") or "video"
+                file_path = await get_lane("download").run(
+                    self._download_sync,
+                    task,
+                    task["url"],
+                    task["format"],
+                    task["quality"],
+                    store.work_dir(key),
+                    info,
+                    on_position=queue_reporter(task),
+                )
+                await loop.run_in_executor(None, store.add, key, file_path, title)
+                await loop.run_in_executor(None, get_storage_manager().enforce_quota)
+
             task["progress"] = 100
             task["status"] = "completed"
+            task["title"] = title
             task["file_path"] = file_path
             logger.info("下载完成: %s -> %s", task_id, file_path)
 
@@ -127,28 +201,67 @@ class DownloadService:
             task["status"] = "error"
             task["error"] = str(e)
 
+        finally:
+            await loop.run_in_executor(None, store.release, key)
+            _inflight.pop(key, None)
+            await _tasks.finish(task_id)
+
+    async def _transcode(
+        self, task: dict, key: str, source_key: str, source_path: str, title: str
+    ) -> tuple[str, str]:
+        """从已下载的 mp4 转码出 mp3 并登记到存储，转码期间持有源文件引用"""
+        store = get_download_store()
+        target = os.path.join(store.work_dir(key), "media.mp3")
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, store.acquire, source_key)
+        try:
+            logger.info("从已下载视频转码音频: %s -> %s", source_key, key)
+            await get_lane("download").run(
+                transcode_to_mp3, source_path, target, on_position=queue_reporter(task)
+            )
+        finally:
+            await loop.run_in_executor(None, store.release, source_key)
+        await loop.run_in_executor(None, store.add, key, target, title)
+        return target, title
+
     async def get_progress(self, task_id: str) -> AsyncGenerator[dict, None]:
         """SSE 推送下载进度"""
+        version = 0
         while True:
-            task = _tasks.get(task_id)
+            task = await _tasks.get(task_id)
             if not task:
                 yield {"status": "error", "message": "任务不存在", "progress": 0}
                 return
 
+            queue_position = task.get("queue_position", 0)
+            message = f"下载中... {task['progress']}%"
+            if queue_position:
+                message = f"排队中，前面还有 {queue_position - 1} 个任务"
             yield {
                 "status": task["status"],
                 "progress": task["progress"],
-                "message": f"下载中... {task['progress']}%",
+                "message": message,
+                "queue_position": queue_position,
             }
 
             if task["status"] in ("completed", "error"):
                 return
 
-            await asyncio.sleep(0.5)
+            version = await wait_for_change(task, version)
 
-    async def get_file_path(self, task_id: str) -> str | None:
-        """获取下载文件路径"""
-        task = _tasks.get(task_id)
+    async def get_file(self, task_id: str) -> tuple[str, str, str] | None:
+        """获取下载文件，返回 (路径, 下载文件名, 存储键)"""
+        task = await _tasks.get(task_id)
         if not task or task["status"] != "completed":
             return None
-        return task["file_path"]
+        file_path = task["file_path"]
+        if not os.path.isfile(file_path):
+            return None
+        title = _UNSAFE_FILENAME_RE.sub("_", task.get("title") or "video").strip() or "video"
+        filename = f"{title[:100]}{os.path.splitext(file_path)[1]}"
+        return file_path, filename, task["artifact_key"]
+
+    async def get_store_stats(self) -> dict:
+        """下载存储占用统计"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, get_download_store().stats)
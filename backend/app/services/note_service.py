@@ -1,18 +1,47 @@
 """笔记生成服务 — 使用 AI 将转录文本生成结构化笔记"""
 
 import asyncio
+import hashlib
 import logging
+import os
+import random
 import uuid
-from collections.abc import AsyncGenerator
+import zlib
+from collections.abc import AsyncGenerator, Callable
+
+import openai
 
 from app.config import settings
 from app.core.ai_client import get_ai_client
+from app.core.disk_cache import DiskCache
+from app.core.job_queue import get_job_backend
+from app.core.task_store import TaskStore, notify, wait_for_change
+from app.core.transcript_store import load_transcript
 from app.models.schemas import NoteResult
-from app.utils.text import chunk_text
+from app.utils.text import chunk_by_tokens, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
-_tasks: dict[str, dict] = {}
+# 可重试的错误：网络中断、超时、限流与服务端 5xx；鉴权、参数、上下文超长等 4xx 重试也不会成功
+_RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def _restore_task(task: dict) -> None:
+    """恢复任务时补回流式片段列表（已结束任务从 result 推送全文）"""
+    task.setdefault("markdown_chunks", [])
+
+
+_tasks = TaskStore(
+    "note",
+    NoteResult,
+    transient_fields=("markdown_chunks",),
+    restore=_restore_task,
+)
 
 NOTE_SYSTEM_PROMPT = """你是一个专业的视频笔记助手。请根据视频转录文本生成结构化的 Markdown 笔记。
 
@@ -41,59 +70,161 @@ NOTE_SYSTEM_PROMPT = """你是一个专业的视频笔记助手。请根据视
 ## 总结
 ..."""
 
+CHUNK_SUMMARY_PROMPT = "请简洁总结以下视频转录片段的核心内容，保留关键信息："
+
+MERGE_SUMMARY_PROMPT = "请合并以下按时间顺序排列的视频内容摘要，去除重复，保留关键信息和先后顺序："
+
+# 分层合并的最大层数，防止模型输出不收敛时无限循环
+MAX_REDUCE_LEVELS = 3
+
+# 笔记缓存：完整结果按 (转录, 语言, 模型, 提示词版本) 缓存；分块/合并摘要按 (模型, 提示词, 输入) 缓存，
+# 只改最终笔记提示词时 map/reduce 摘要全部命中，只需重跑最后一步
+_cache = DiskCache(
+    os.path.join(settings.temp_dir, "cache", "notes.db"),
+    settings.note_cache_max_mb * 1024 * 1024,
+)
+_cache_stats = {"hits": 0, "misses": 0, "summary_hits": 0, "summary_misses": 0}
+
+
+def _digest(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _result_key(text: str, language: str) -> str:
+    """完整笔记的缓存键，任一提示词或分块参数变化都会失效"""
+    prompt_version = _digest(NOTE_SYSTEM_PROMPT, CHUNK_SUMMARY_PROMPT, MERGE_SUMMARY_PROMPT)[:12]
+    return "note:" + _digest(
+        text,
+        language,
+        settings.openai_model,
+        prompt_version,
+        str(settings.note_chunk_tokens),
+        str(settings.note_context_budget),
+    )
+
+
+def _summary_key(system_prompt: str, content: str) -> str:
+    return "summary:" + _digest(settings.openai_model, system_prompt, content)
+
+
+def _group_by_budget(parts: list[str], budget: int) -> list[list[str]]:
+    """按顺序把摘要装入估算 token 数不超过 budget 的分组"""
+    groups: list[list[str]] = []
+    size = 0
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if groups and size + tokens <= budget:
+            groups[-1].append(part)
+            size += tokens
+        else:
+            groups.append([part])
+            size = tokens
+    return groups
+
 
 class NoteService:
     """AI 笔记生成服务"""
 
-    async def generate(self, text: str, language: str = "zh") -> str:
-        """生成笔记，返回 task_id"""
+    async def generate(
+        self,
+        text: str | None = None,
+        language: str = "zh",
+        transcript_id: str | None = None,
+    ) -> str:
+        """生成笔记，返回 task_id
+
+        传 transcript_id 时从服务端转录存储读取文本（不存在时抛出 LookupError），
+        队列模式下只有 ID 进入任务负载。
+        """
+        if transcript_id:
+            await load_transcript(transcript_id)
+            text = None
+        elif not text:
+            raise ValueError("请提供转录文本或 transcript_id")
+
         task_id = str(uuid.uuid4())[:8]
 
-        _tasks[task_id] = {
+        task = {
             "status": "processing",
             "progress": 0,
             "result": None,
             "markdown_chunks": [],
         }
+        args = {"text": text, "language": language, "transcript_id": transcript_id}
 
-        asyncio.create_task(self._run_generate(task_id, text, language))
+        if get_job_backend() is not None:
+            await _tasks.submit(task_id, task, args)
+        else:
+            _tasks.create(task_id, task)
+            asyncio.create_task(self._run_generate(task_id, **args))
 
         logger.info("笔记生成任务已创建: %s", task_id)
         return task_id
 
+    async def run_job(self, task_id: str, task: dict, args: dict) -> None:
+        """在队列工作进程中执行笔记生成任务"""
+        _tasks.create(task_id, task)
+        await self._run_generate(task_id, **args)
+
     async def _run_generate(
-        self, task_id: str, text: str, language: str
+        self,
+        task_id: str,
+        text: str | None,
+        language: str,
+        transcript_id: str | None = None,
     ) -> None:
         """执行 AI 笔记生成"""
-        task = _tasks.get(task_id)
+        task = await _tasks.get(task_id)
         if not task:
             return
 
         try:
+            if transcript_id:
+                text = (await load_transcript(transcript_id)).text
+
+            loop = asyncio.get_event_loop()
+            result_key = _result_key(text, language)
+            cached = await loop.run_in_executor(None, self._cache_get_result, result_key)
+            if cached is not None:
+                _cache_stats["hits"] += 1
+                logger.info("笔记缓存命中: %s", task_id)
+                task["result"] = cached
+                task["progress"] = 100
+                task["status"] = "completed"
+                return
+            _cache_stats["misses"] += 1
+
             client = get_ai_client()
-            chunks = chunk_text(text, chunk_size=8000, overlap=200)
+            chunks = [
+                chunk.text
+                for chunk in chunk_by_tokens(text, max_tokens=settings.note_chunk_tokens)
+            ]
 
             # 如果文本较短，直接一次性生成
             if len(chunks) == 1:
                 content = chunks[0]
             else:
-                # 长文本：先分块摘要，再合并
-                summaries: list[str] = []
-                for i, chunk in enumerate(chunks):
-                    task["progress"] = int((i / len(chunks)) * 60)
-                    resp = await client.chat.completions.create(
-                        model=settings.openai_model,
-                        messages=[
-                            {"role": "system", "content": "请简洁总结以下视频转录片段的核心内容，保留关键信息："},
-                            {"role": "user", "content": chunk},
-                        ],
-                        temperature=0.3,
-                    )
-                    summaries.append(resp.choices[0].message.content or "")
-                content = "\n\n".join(summaries)
+                # 长文本：并发分块摘要（map），再按上下文预算分层合并（reduce）
+                completed = 0
+
+                def on_chunk_done() -> None:
+                    nonlocal completed
+                    completed += 1
+                    task["progress"] = int((completed / len(chunks)) * 60)
+                    notify(task)
+
+                summaries = await self._summarize_all(
+                    chunks, CHUNK_SUMMARY_PROMPT, on_chunk_done
+                )
+                content = await self._reduce_summaries(summaries)
 
             # 生成最终笔记（流式）
             task["progress"] = 70
+            notify(task)
             markdown_parts: list[str] = []
 
             stream = await client.chat.completions.create(
@@ -111,10 +242,9 @@ class NoteService:
                 if delta:
                     markdown_parts.append(delta)
                     task["markdown_chunks"].append(delta)
+                    notify(task)
 
             full_markdown = "".join(markdown_parts)
-            task["progress"] = 100
-            task["status"] = "completed"
 
             # 提取大纲（从 markdown 标题中提取）
             outline = [
@@ -128,6 +258,13 @@ class NoteService:
                 markdown=full_markdown,
                 outline=outline,
             )
+            await loop.run_in_executor(
+                None, self._cache_set_result, result_key, task["result"]
+            )
+            # 全文已在 result 中，释放流式片段
+            task["markdown_chunks"] = []
+            task["progress"] = 100
+            task["status"] = "completed"
             logger.info("笔记生成完成: %s", task_id)
 
         except Exception as e:
@@ -135,35 +272,150 @@ class NoteService:
             task["status"] = "error"
             task["error"] = str(e)
 
+        finally:
+            await _tasks.finish(task_id)
+
+    def _cache_get_result(self, key: str) -> NoteResult | None:
+        data = _cache.get(key)
+        if data is None:
+            return None
+        return NoteResult.model_validate_json(zlib.decompress(data))
+
+    def _cache_set_result(self, key: str, result: NoteResult) -> None:
+        _cache.set(key, zlib.compress(result.model_dump_json().encode("utf-8")))
+
+    async def _complete_cached(self, system_prompt: str, content: str) -> str:
+        """摘要补全，相同模型、提示词和输入直接复用缓存"""
+        loop = asyncio.get_event_loop()
+        key = _summary_key(system_prompt, content)
+        data = await loop.run_in_executor(None, _cache.get, key)
+        if data is not None:
+            _cache_stats["summary_hits"] += 1
+            return zlib.decompress(data).decode("utf-8")
+
+        _cache_stats["summary_misses"] += 1
+        summary = await self._complete_with_retry(system_prompt, content)
+        if summary:
+            data = zlib.compress(summary.encode("utf-8"))
+            await loop.run_in_executor(None, _cache.set, key, data)
+        return summary
+
+    async def _complete_with_retry(self, system_prompt: str, content: str) -> str:
+        """非流式补全，网络、限流和服务端错误时指数退避重试，其他错误直接抛出"""
+        client = get_ai_client()
+        attempt = 0
+        while True:
+            try:
+                resp = await client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": content},
+                    ],
+                    temperature=0.3,
+                )
+                return resp.choices[0].message.content or ""
+            except _RETRYABLE_ERRORS as e:
+                if attempt >= settings.note_max_retries:
+                    raise
+                delay = 2**attempt + random.random()
+                attempt += 1
+                logger.warning(
+                    "摘要请求失败，%.1f 秒后重试 (%d/%d): %s",
+                    delay, attempt, settings.note_max_retries, e,
+                )
+                await asyncio.sleep(delay)
+
+    async def _summarize_all(
+        self,
+        parts: list[str],
+        system_prompt: str,
+        on_done: Callable[[], None] | None = None,
+    ) -> list[str]:
+        """并发摘要（信号量限流），结果按输入顺序返回"""
+        semaphore = asyncio.Semaphore(settings.note_map_concurrency)
+
+        async def summarize(part: str) -> str:
+            async with semaphore:
+                summary = await self._complete_cached(system_prompt, part)
+            if on_done:
+                on_done()
+            return summary
+
+        jobs = [asyncio.ensure_future(summarize(part)) for part in parts]
+        try:
+            return list(await asyncio.gather(*jobs))
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+
+    async def _reduce_summaries(self, summaries: list[str]) -> str:
+        """合并摘要；总长度超出上下文预算时分组再摘要，逐层收敛"""
+        budget = settings.note_context_budget
+        for level in range(MAX_REDUCE_LEVELS):
+            total = sum(estimate_tokens(summary) for summary in summaries)
+            if total <= budget or len(summaries) == 1:
+                break
+            groups = _group_by_budget(summaries, budget)
+            logger.info("摘要分层合并: 第 %d 层, %d -> %d", level + 1, len(summaries), len(groups))
+            summaries = await self._summarize_all(
+                ["\n\n".join(group) for group in groups], MERGE_SUMMARY_PROMPT
+            )
+        return "\n\n".join(summaries)
+
     async def stream_result(self, task_id: str) -> AsyncGenerator[dict, None]:
         """流式推送笔记生成过程"""
         sent_index = 0
+        sent_chars = 0
+        version = 0
         while True:
-            task = _tasks.get(task_id)
+            task = await _tasks.get(task_id)
             if not task:
                 yield {"status": "error", "message": "任务不存在"}
                 return
 
+            if task["status"] == "completed":
+                # 完成后片段已释放，剩余内容从完整结果中补发
+                remaining = task["result"].markdown[sent_chars:]
+                if remaining:
+                    yield {"status": "streaming", "content": remaining}
+                yield {"status": "completed"}
+                return
+
             # 推送新的 markdown 片段
             chunks = task.get("markdown_chunks", [])
             if sent_index < len(chunks):
                 new_content = "".join(chunks[sent_index:])
                 sent_index = len(chunks)
+                sent_chars += len(new_content)
                 yield {"status": "streaming", "content": new_content}
 
-            if task["status"] == "completed":
-                yield {"status": "completed"}
-                return
-
             if task["status"] == "error":
                 yield {"status": "error", "message": task.get("error", "未知错误")}
                 return
 
-            await asyncio.sleep(0.2)
+            version = await wait_for_change(task, version)
 
     async def get_result(self, task_id: str) -> NoteResult | None:
         """获取笔记结果"""
-        task = _tasks.get(task_id)
+        task = await _tasks.get(task_id)
         if not task or task["status"] != "completed":
             return None
         return task["result"]
+
+    async def get_cache_stats(self) -> dict:
+        """笔记缓存命中统计"""
+        loop = asyncio.get_event_loop()
+        usage = await loop.run_in_executor(None, _cache.stats)
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        summary_lookups = _cache_stats["summary_hits"] + _cache_stats["summary_misses"]
+        return {
+            **_cache_stats,
+            "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "summary_hit_rate": (
+                round(_cache_stats["summary_hits"] / summary_lookups, 4)
+                if summary_lookups else 0.0
+            ),
+            **usage,
+        }
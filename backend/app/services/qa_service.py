@@ -1,10 +1,21 @@
-"""视频问答服务 — 基于转录内容的 AI 问答"""
+"""视频问答服务 — 基于转录内容的 AI 多轮问答"""
 
+import asyncio
+import hashlib
 import logging
+import time
+import uuid
+from collections import OrderedDict
 from collections.abc import AsyncGenerator
 
 from app.config import settings
 from app.core.ai_client import get_ai_client
+from app.core.answer_cache import AnswerCache
+from app.core.transcript_store import load_transcript
+from app.models.schemas import TranscriptionSegment
+from app.utils.retrieval import BM25Index
+from app.utils.text import estimate_tokens, truncate_text
+from app.utils.ytdlp import normalize_video_id
 
 logger = logging.getLogger(__name__)
 
@@ -16,43 +27,377 @@ QA_SYSTEM_PROMPT = """你是一个视频内容问答助手。用户会提供视
 3. 回答简洁准确，必要时引用视频中的原话
 4. 使用中文回答"""
 
+QA_RETRIEVAL_SYSTEM_PROMPT = """你是一个视频内容问答助手。用户的每个问题都会附带从视频转录中检索出的相关片段（每段标注了时间范围）。
+
+要求：
+1. 只根据提供的片段回答，不要编造信息
+2. 如果片段中没有相关信息，明确告知用户
+3. 回答简洁准确，引用内容时用 [MM:SS] 标注出处时间，例如 [03:15]
+4. 使用中文回答"""
+
+HISTORY_SUMMARY_PROMPT = """你是一个对话整理助手。请把以下视频问答对话压缩成简洁的摘要。
+
+要求：
+1. 保留用户问过的问题和得到的关键结论
+2. 保留回答中引用的时间点
+3. 如果提供了更早的摘要，把它与新对话合并成一份
+4. 使用中文，不超过 300 字"""
+
+CONTEXT_ACK = "好的，我已经阅读了视频内容。请问你有什么问题？"
+SUMMARY_ACK = "好的，我会结合之前的对话继续回答。"
+# 回放缓存答案时每个 SSE 事件的字数
+REPLAY_CHUNK_CHARS = 24
+
+# 问答会话：session_id -> 会话状态（按最近使用排序，超时或超出上限时淘汰）
+_sessions: OrderedDict[str, dict] = OrderedDict()
+# 全局 token 用量统计（cached_tokens 为命中服务商提示缓存的输入 token）
+_usage_stats = {"turns": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+# 首轮问答的答案缓存（追问依赖对话历史，不缓存）
+_answer_cache = AnswerCache(
+    settings.qa_answer_cache_size,
+    settings.qa_answer_cache_ttl,
+    settings.qa_answer_cache_similarity,
+)
+# 视频 -> 最近一次使用的转录内容键，转录变化时失效旧答案
+_video_contents: OrderedDict[str, str] = OrderedDict()
+
+# 视频检索索引缓存：转录内容哈希 -> 索引（LRU）
+_indexes: OrderedDict[str, BM25Index] = OrderedDict()
+
+
+def _build_index(context: str, segments: list[TranscriptionSegment] | None) -> BM25Index:
+    """构建检索索引，优先使用带时间戳的片段"""
+    if segments:
+        return BM25Index.from_segments(segments, settings.qa_passage_tokens)
+    return BM25Index.from_text(context, settings.qa_passage_tokens)
+
+
+async def _get_index(
+    context: str,
+    segments: list[TranscriptionSegment] | None,
+    transcript_id: str | None = None,
+) -> BM25Index:
+    """获取视频的检索索引，同一份转录只构建一次"""
+    if transcript_id:
+        key = f"transcript:{transcript_id}"
+    else:
+        source = "\n".join(seg.text for seg in segments) if segments else context
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    index = _indexes.get(key)
+    if index is not None:
+        _indexes.move_to_end(key)
+        return index
+
+    loop = asyncio.get_event_loop()
+    index = await loop.run_in_executor(None, _build_index, context, segments)
+    _indexes[key] = index
+    while len(_indexes) > settings.qa_index_cache_size:
+        _indexes.popitem(last=False)
+    logger.info("构建检索索引: %d 个段落", len(index.passages))
+    return index
+
+
+def _purge_sessions() -> None:
+    """淘汰超时的会话，超出上限时淘汰最久未使用的"""
+    now = time.time()
+    while _sessions:
+        session_id, session = next(iter(_sessions.items()))
+        expired = now - session["updated"] > settings.qa_session_ttl_seconds
+        if not expired and len(_sessions) <= settings.qa_session_max:
+            break
+        _sessions.pop(session_id)
+
+
+def _usage_summary(turns: int, prompt: int, cached: int, completion: int) -> dict:
+    return {
+        "turns": turns,
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "uncached_tokens": prompt - cached,
+        "completion_tokens": completion,
+        "cache_rate": round(cached / prompt, 4) if prompt else 0.0,
+    }
+
 
 class QAService:
-    """视频问答服务"""
+    """视频问答服务
+
+    每个会话在创建时固定提示前缀（系统提示 + 转录全文），之后每轮只在末尾追加对话，
+    保证前缀逐字节不变以命中服务商的提示缓存。历史超出 qa_history_tokens 时，
+    较早的轮次被压缩成摘要（摘要只在压缩时变化）。
+    长转录走检索模式：前缀只有系统提示，每轮问题附带检索出的片段，历史中只保留问题原文。
+    """
 
     async def ask(
         self,
         question: str,
         context: str,
         video_url: str,
-    ) -> AsyncGenerator[str, None]:
-        """基于视频内容回答问题（流式输出）"""
-        logger.info("问答请求: %s (视频: %s)", question, video_url)
+        segments: list[TranscriptionSegment] | None = None,
+        transcript_id: str | None = None,
+        session_id: str | None = None,
+    ) -> AsyncGenerator[dict, None]:
+        """基于视频内容回答问题，流式输出事件
 
-        client = get_ai_client()
+        依次产出 {"session_id"}、若干 {"content"}，最后是带本轮 token 用量的 {"status": "completed"}。
+        session_id 为空或已过期时新建会话，上下文参数只在新建会话时使用；
+        传 transcript_id 时从服务端转录存储读取上下文，忽略 context / segments。
+        """
+        logger.info("问答请求: %s (视频: %s, 会话: %s)", question, video_url, session_id)
 
-        messages: list[dict[str, str]] = [
-            {"role": "system", "content": QA_SYSTEM_PROMPT},
-        ]
+        session = self._get_session(session_id) if session_id else None
+        if session is None:
+            session = await self._create_session(context, video_url, segments, transcript_id)
+        yield {"session_id": session["id"]}
+
+        async with session["_lock"]:
+            first_turn = not session["history"] and not session["summary"]
+            cache_key = session["content_key"] if first_turn else ""
+            cached = _answer_cache.get(cache_key, question) if cache_key else None
+            if cached is not None:
+                logger.info("问答答案缓存命中: %s", question)
+                for i in range(0, len(cached), REPLAY_CHUNK_CHARS):
+                    yield {"content": cached[i:i + REPLAY_CHUNK_CHARS]}
+                session["history"].append({"role": "user", "content": question})
+                session["history"].append({"role": "assistant", "content": cached})
+                session["updated"] = time.time()
+                turn_usage = self._record_usage(session, None)
+                yield {
+                    "status": "completed",
+                    "session_id": session["id"],
+                    "usage": turn_usage,
+                    "cached": True,
+                }
+                return
+
+            messages = [
+                *session["prefix"],
+                *self._summary_messages(session),
+                *session["history"],
+                {"role": "user", "content": await self._turn_content(session, question)},
+            ]
 
+            kwargs = {}
+            if settings.qa_stream_usage:
+                kwargs["stream_options"] = {"include_usage": True}
+            stream = await get_ai_client().chat.completions.create(
+                model=settings.openai_model,
+                messages=messages,
+                temperature=0.5,
+                stream=True,
+                **kwargs,
+            )
+
+            answer: list[str] = []
+            usage = None
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    answer.append(delta)
+                    yield {"content": delta}
+
+            answer_text = "".join(answer)
+            session["history"].append({"role": "user", "content": question})
+            session["history"].append({"role": "assistant", "content": answer_text})
+            session["updated"] = time.time()
+            if cache_key:
+                _answer_cache.set(cache_key, question, answer_text)
+            turn_usage = self._record_usage(session, usage)
+            yield {"status": "completed", "session_id": session["id"], "usage": turn_usage}
+
+            # 回答已推送完毕，再压缩历史，不影响本轮首字延迟
+            await self._compact(session)
+
+    def _get_session(self, session_id: str) -> dict | None:
+        _purge_sessions()
+        session = _sessions.get(session_id)
+        if session is not None:
+            _sessions.move_to_end(session_id)
+        return session
+
+    async def _create_session(
+        self,
+        context: str,
+        video_url: str,
+        segments: list[TranscriptionSegment] | None,
+        transcript_id: str | None,
+    ) -> dict:
+        """新建会话并固定提示前缀"""
+        if transcript_id:
+            transcript = await load_transcript(transcript_id)
+            context, segments = transcript.text, transcript.segments
+        if segments and not context:
+            context = "\n".join(seg.text for seg in segments)
+
+        content_key = ""
         if context:
-            messages.append(
-                {"role": "user", "content": f"以下是视频的转录内容：\n\n{context}"}
+            content_key = (
+                f"transcript:{transcript_id}" if transcript_id
+                else hashlib.sha256(context.encode("utf-8")).hexdigest()
             )
-            messages.append(
-                {"role": "assistant", "content": "好的，我已经阅读了视频内容。请问你有什么问题？"}
+            self._track_content(video_url, content_key)
+
+        retrieval = bool(context) and estimate_tokens(context) > settings.qa_full_context_tokens
+        if retrieval:
+            prefix = [{"role": "system", "content": QA_RETRIEVAL_SYSTEM_PROMPT}]
+        else:
+            prefix = [{"role": "system", "content": QA_SYSTEM_PROMPT}]
+            if context:
+                prefix.append(
+                    {"role": "user", "content": f"以下是视频的转录内容：\n\n{context}"}
+                )
+                prefix.append({"role": "assistant", "content": CONTEXT_ACK})
+
+        session = {
+            "id": uuid.uuid4().hex[:12],
+            "video_url": video_url,
+            "content_key": content_key,  # 视频内容键，为空时不缓存答案
+            "prefix": prefix,
+            "summary": "",
+            "history": [],
+            "usage": [],
+            "updated": time.time(),
+            # 检索模式每轮按问题检索片段
+            "retrieval": retrieval,
+            "context": context if retrieval else "",
+            "segments": segments if retrieval else None,
+            "transcript_id": transcript_id,
+            "_lock": asyncio.Lock(),
+        }
+        _purge_sessions()
+        _sessions[session["id"]] = session
+        logger.info("新建问答会话: %s (检索模式: %s)", session["id"], retrieval)
+        return session
+
+    def _track_content(self, video_url: str, content_key: str) -> None:
+        """记录视频当前的转录内容，内容变化时失效旧内容的缓存答案"""
+        video_id = normalize_video_id(video_url) if video_url else ""
+        if not video_id:
+            return
+        previous = _video_contents.pop(video_id, None)
+        if previous is not None and previous != content_key:
+            dropped = _answer_cache.invalidate(previous)
+            logger.info("视频转录已变化，失效 %d 条缓存答案: %s", dropped, video_id)
+        _video_contents[video_id] = content_key
+        while len(_video_contents) > settings.qa_answer_cache_size:
+            _video_contents.popitem(last=False)
+
+    async def _turn_content(self, session: dict, question: str) -> str:
+        """本轮用户消息：检索模式下附带与问题相关的片段"""
+        if not session["retrieval"]:
+            return question
+
+        context = session["context"]
+        index = await _get_index(context, session["segments"], session["transcript_id"])
+        passages = index.search(question, settings.qa_top_k)
+        logger.info("检索问答: 使用 %d 个段落", len(passages))
+        if passages:
+            excerpt = "\n\n".join(f"{p.label} {p.text}".strip() for p in passages)
+            intro = "以下是与问题相关的视频片段（按时间排序）"
+        else:
+            # 没有命中任何片段时退回截断全文
+            excerpt = truncate_text(context, settings.qa_full_context_tokens * 2)
+            intro = "以下是视频的转录内容（已截断）"
+        return f"{intro}：\n\n{excerpt}\n\n问题：{question}"
+
+    def _summary_messages(self, session: dict) -> list[dict[str, str]]:
+        if not session["summary"]:
+            return []
+        return [
+            {"role": "user", "content": f"此前对话的摘要：\n\n{session['summary']}"},
+            {"role": "assistant", "content": SUMMARY_ACK},
+        ]
+
+    async def _compact(self, session: dict) -> None:
+        """历史超出预算时，把较早的轮次合并进摘要，只保留最近几轮原文"""
+        history = session["history"]
+        if sum(estimate_tokens(m["content"]) for m in history) <= settings.qa_history_tokens:
+            return
+        split = max(len(history) - settings.qa_history_keep_turns * 2, 0)
+        old, recent = history[:split], history[split:]
+        if not old:
+            return
+
+        dialogue = "\n\n".join(
+            f"{'用户' if m['role'] == 'user' else '助手'}：{m['content']}" for m in old
+        )
+        if session["summary"]:
+            dialogue = f"更早的摘要：\n{session['summary']}\n\n新的对话：\n{dialogue}"
+
+        try:
+            resp = await get_ai_client().chat.completions.create(
+                model=settings.openai_model,
+                messages=[
+                    {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+                    {"role": "user", "content": dialogue},
+                ],
+                temperature=0.3,
             )
+        except Exception as e:
+            # 压缩失败不影响会话，下一轮再试
+            logger.warning("问答历史压缩失败: %s - %s", session["id"], e)
+            return
 
-        messages.append({"role": "user", "content": question})
+        session["summary"] = resp.choices[0].message.content or session["summary"]
+        session["history"] = recent
+        logger.info("问答历史已压缩: %s (%d 条消息)", session["id"], len(old))
 
-        stream = await client.chat.completions.create(
-            model=settings.openai_model,
-            messages=messages,
-            temperature=0.5,
-            stream=True,
+    def _record_usage(self, session: dict, usage: object | None) -> dict:
+        """记录本轮 token 用量，区分命中提示缓存与未命中的输入 token"""
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+
+        session["usage"].append(
+            {"prompt_tokens": prompt, "cached_tokens": cached, "completion_tokens": completion}
         )
+        _usage_stats["turns"] += 1
+        _usage_stats["prompt_tokens"] += prompt
+        _usage_stats["cached_tokens"] += cached
+        _usage_stats["completion_tokens"] += completion
+        return _usage_summary(1, prompt, cached, completion)
+
+    def get_session_metrics(self, session_id: str) -> dict | None:
+        """会话的逐轮 token 用量"""
+        session = self._get_session(session_id)
+        if session is None:
+            return None
+        turns = session["usage"]
+        return {
+            "session_id": session_id,
+            "retrieval": session["retrieval"],
+            "compacted": bool(session["summary"]),
+            "turns": [
+                _usage_summary(1, t["prompt_tokens"], t["cached_tokens"], t["completion_tokens"])
+                for t in turns
+            ],
+            "total": _usage_summary(
+                len(turns),
+                sum(t["prompt_tokens"] for t in turns),
+                sum(t["cached_tokens"] for t in turns),
+                sum(t["completion_tokens"] for t in turns),
+            ),
+        }
+
+    def close_session(self, session_id: str) -> bool:
+        """结束会话，返回是否存在"""
+        return _sessions.pop(session_id, None) is not None
 
-        async for chunk in stream:
-            delta = chunk.choices[0].delta.content
-            if delta:
-                yield delta
+    def get_stats(self) -> dict:
+        """全局问答 token 用量统计"""
+        return {
+            "sessions": len(_sessions),
+            "answer_cache": _answer_cache.stats(),
+            **_usage_summary(
+                _usage_stats["turns"],
+                _usage_stats["prompt_tokens"],
+                _usage_stats["cached_tokens"],
+                _usage_stats["completion_tokens"],
+            ),
+        }
@@ -1,19 +1,59 @@
-"""STT 服务 — SenseVoice 语音识别"""
+"""STT 服务 — SenseVoice 语音识别，可选本地 Whisper"""
 
+import io
 import logging
 
 from app.config import settings
 from app.core.ai_client import get_ai_client
+from app.core.scheduler import PRIORITY_INTERACTIVE, get_lane
+from app.core.whisper_client import STTWhisperClient
 
 logger = logging.getLogger(__name__)
 
 
+def _transcribe_local_sync(audio_data: bytes) -> str:
+    """在内存中解码上传的短音频并用本地模型识别"""
+    from faster_whisper import decode_audio
+
+    audio = decode_audio(io.BytesIO(audio_data), sampling_rate=16000)
+    model = STTWhisperClient.get_model()
+    segments, _ = model.transcribe(
+        audio,
+        beam_size=1,
+        vad_filter=True,
+        language=settings.stt_language or None,
+        condition_on_previous_text=False,
+    )
+    return "".join(seg.text for seg in segments).strip()
+
+
 class STTService:
 
     async def transcribe(self, audio_data: bytes, filename: str = "audio.webm") -> str:
+        if settings.stt_engine == "local":
+            return await self.transcribe_local(audio_data)
+        return await self.transcribe_remote(audio_data, filename)
+
+    async def transcribe_remote(self, audio_data: bytes, filename: str = "audio.webm") -> str:
         client = get_ai_client()
         response = await client.audio.transcriptions.create(
             model=settings.stt_model,
             file=(filename, audio_data),
         )
         return response.text
+
+    async def transcribe_local(self, audio_data: bytes) -> str:
+        """在调度器的 stt 类别中识别，不与长视频转录任务排队"""
+        lane = get_lane("stt")
+        lane.admit()
+        try:
+            return await lane.run(
+                _transcribe_local_sync, audio_data, priority=PRIORITY_INTERACTIVE
+            )
+        finally:
+            lane.leave()
+
+    def warm_up(self) -> None:
+        """本地模式下在识别线程中预加载模型，首个语音提问不必等待加载"""
+        if settings.stt_engine == "local":
+            get_lane("stt").executor.submit(STTWhisperClient.get_model)
@@ -1,30 +1,89 @@
 """音频转录服务 — 使用 Faster-Whisper 本地转录"""
 
 import asyncio
+import hashlib
 import logging
 import os
-import tempfile
+import queue
+import threading
 import uuid
+import zlib
+from collections import Counter
 from collections.abc import AsyncGenerator
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 import yt_dlp
 
 from app.config import settings
-from app.core.whisper_client import get_whisper_model
+from app.core.disk_cache import DiskCache
+from app.core.job_queue import get_job_backend
+from app.core.scheduler import PRIORITY_NORMAL, get_lane
+from app.core.storage import get_storage_manager
+from app.core.task_store import TaskStore, notify, queue_reporter, wait_for_change
+from app.core.transcript_store import get_transcript_store, load_transcript
+from app.core.whisper_client import WhisperModelPool
+from app.core.whisper_workers import WhisperProcessPool, transcribe_window
 from app.models.schemas import TranscriptionResult, TranscriptionSegment
-from app.utils.ytdlp import build_ydl_opts
+from app.services.video_service import VideoService
+from app.utils.audio import (
+    SAMPLE_RATE,
+    open_pcm_stream,
+    read_pcm_blocks,
+    split_windows,
+    stitch_segments,
+)
+from app.utils.subtitles import check_quality, parse_subtitles, select_track
+from app.utils.ytdlp import build_ydl_opts, normalize_video_id, process_info
 
 logger = logging.getLogger(__name__)
 
-_executor = ThreadPoolExecutor(max_workers=2)
-_tasks: dict[str, dict] = {}
+
+def _restore_task(task: dict) -> None:
+    """从持久化或共享状态恢复任务时重建片段列表"""
+    result = task.get("result")
+    if result is not None:
+        task["segments"] = result.segments
+    else:
+        task["segments"] = [
+            TranscriptionSegment.model_validate(seg) for seg in task.get("segments", [])
+        ]
+
+
+_tasks = TaskStore(
+    "transcribe",
+    TranscriptionResult,
+    transient_fields=("segments",),
+    restore=_restore_task,
+)
+
+# 转录结果缓存：来源键（视频 ID + 模型）与音频键（音频哈希 + 模型）都指向同一结果
+_cache = DiskCache(
+    os.path.join(settings.temp_dir, "cache", "transcripts.db"),
+    settings.transcribe_cache_max_mb * 1024 * 1024,
+)
+_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "subtitles": 0}
+# 进行中的转录：来源键 -> 负责执行的 task_id
+_inflight: dict[str, str] = {}
+
+
+def _hash_file(path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 class TranscribeService:
     """音频转录服务"""
 
-    def _download_audio_sync(self, url: str, output_dir: str) -> str:
+    def __init__(self) -> None:
+        self._video_service = VideoService()
+
+    def _download_audio_sync(
+        self, url: str, output_dir: str, info: dict | None = None
+    ) -> str:
         output_path = os.path.join(output_dir, "audio.%(ext)s")
         extra = {
             "format": "bestaudio/best",
@@ -39,7 +98,7 @@ class TranscribeService:
         }
         opts = build_ydl_opts(url, extra)
         with yt_dlp.YoutubeDL(opts) as ydl:
-            ydl.download([url])
+            process_info(ydl, url, info, download=True)
 
         # 找到生成的 wav 文件
         for f in os.listdir(output_dir):
@@ -49,31 +108,32 @@ class TranscribeService:
         raise FileNotFoundError("音频提取失败")
 
     def _transcribe_sync(self, audio_path: str, task: dict) -> TranscriptionResult:
-        """Whisper 转录（同步，线程池中运行）"""
-        model = get_whisper_model()
-
-        segments_raw, info = model.transcribe(
-            audio_path,
-            beam_size=5,
-            vad_filter=True,
-        )
+        """Whisper 转录（同步，线程池中运行），转录期间独占模型池中的一个副本"""
+        with WhisperModelPool.acquire() as model:
+            segments_raw, info = model.transcribe(
+                audio_path,
+                beam_size=5,
+                vad_filter=True,
+            )
 
-        segments: list[TranscriptionSegment] = []
-        full_text_parts: list[str] = []
-        total_duration = info.duration or 1.0
+            segments: list[TranscriptionSegment] = []
+            full_text_parts: list[str] = []
+            total_duration = info.duration or 1.0
 
-        for seg in segments_raw:
-            segments.append(
-                TranscriptionSegment(
+            for seg in segments_raw:
+                segment = TranscriptionSegment(
                     start=round(seg.start, 2),
                     end=round(seg.end, 2),
                     text=seg.text.strip(),
                 )
-            )
-            full_text_parts.append(seg.text.strip())
-            # 更新进度（10% ~ 90%）
-            progress = min(90, 10 + int((seg.end / total_duration) * 80))
-            task["progress"] = progress
+                segments.append(segment)
+                full_text_parts.append(segment.text)
+                # 解码出的片段立即对 SSE 订阅者可见
+                task["segments"].append(segment)
+                # 更新进度（10% ~ 90%）
+                progress = min(90, 10 + int((seg.end / total_duration) * 80))
+                task["progress"] = progress
+                notify(task)
 
         return TranscriptionResult(
             text="\n".join(full_text_parts),
@@ -82,60 +142,300 @@ class TranscribeService:
             duration=round(total_duration, 2),
         )
 
+    def _transcribe_parallel_sync(
+        self, audio_path: str, task: dict
+    ) -> TranscriptionResult:
+        """按静音切分窗口，在进程池中并行转录后拼接（同步，线程池中运行）"""
+        from faster_whisper.audio import decode_audio
+
+        audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        total_duration = len(audio) / SAMPLE_RATE or 1.0
+        windows = split_windows(
+            audio,
+            settings.whisper_window_seconds,
+            settings.whisper_window_overlap_seconds,
+        )
+        logger.info(
+            "并行转录: %d 个窗口, %d 进程", len(windows), settings.whisper_parallel_workers
+        )
+
+        pool = WhisperProcessPool.get_pool()
+        futures = {
+            pool.submit(transcribe_window, audio[w.start:w.end]): i
+            for i, w in enumerate(windows)
+        }
+        window_results: list[list[TranscriptionSegment] | None] = [None] * len(windows)
+        languages: Counter[str] = Counter()
+        done_seconds = 0.0
+        next_window = 0
+
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                raw_segments, language = future.result()
+                window_results[i] = [
+                    TranscriptionSegment(start=round(start, 2), end=round(end, 2), text=text)
+                    for start, end, text in stitch_segments(windows[i], raw_segments)
+                ]
+                # 只推送从头开始连续完成的窗口，保证 SSE 片段按时间顺序
+                while next_window < len(windows) and window_results[next_window] is not None:
+                    task["segments"].extend(window_results[next_window])
+                    next_window += 1
+                if language:
+                    languages[language] += windows[i].duration
+                # 更新进度（10% ~ 90%），按已完成窗口的总时长计算
+                done_seconds += windows[i].duration
+                task["progress"] = min(90, 10 + int((done_seconds / total_duration) * 80))
+                notify(task)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        segments = [
+            segment
+            for window_segments in window_results
+            for segment in window_segments or []
+        ]
+
+        return TranscriptionResult(
+            text="\n".join(seg.text for seg in segments),
+            segments=segments,
+            language=languages.most_common(1)[0][0] if languages else "unknown",
+            duration=round(total_duration, 2),
+        )
+
+    def _stream_transcribe_sync(
+        self, url: str, task: dict, info: dict | None = None
+    ) -> TranscriptionResult:
+        """边下载边转录（同步，线程池中运行）
+
+        ffmpeg 直接读取媒体 URL 并解码为 16kHz PCM，后台线程按窗口读入有界队列，
+        Whisper 逐窗口转录。每个窗口的最后一个片段可能被截断，连同其音频留到下一窗口重转。
+        """
+        import numpy as np
+
+        opts = build_ydl_opts(url, {"format": "bestaudio/best", "noplaylist": True})
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = process_info(ydl, url, info, download=False)
+            media_url = info["url"]
+            headers = dict(info.get("http_headers") or {})
+            cookie = ydl.cookiejar.get_cookie_header(media_url)
+            if cookie:
+                headers["Cookie"] = cookie
+        total_duration = float(info.get("duration") or 0)
+
+        proc = open_pcm_stream(media_url, headers)
+        blocks: queue.Queue = queue.Queue(maxsize=2)
+
+        def reader() -> None:
+            try:
+                for block in read_pcm_blocks(
+                    proc.stdout, settings.transcribe_stream_window_seconds
+                ):
+                    blocks.put(block)
+            finally:
+                blocks.put(None)
+
+        threading.Thread(target=reader, daemon=True).start()
+
+        with WhisperModelPool.acquire() as model:
+            segments: list[TranscriptionSegment] = []
+            language: str | None = None
+            carry = np.zeros(0, dtype=np.float32)
+            carry_offset = 0.0  # carry 起点对应的全局时间（秒）
+            finished = False
+
+            try:
+                while not finished:
+                    block = blocks.get()
+                    finished = block is None
+                    buffer = carry if finished else np.concatenate([carry, block])
+                    if len(buffer) == 0:
+                        continue
+
+                    segments_raw, info = model.transcribe(
+                        buffer,
+                        beam_size=5,
+                        vad_filter=True,
+                        language=language,
+                    )
+                    window_segments = list(segments_raw)
+                    language = language or info.language
+
+                    # 非最后窗口：保留末尾片段的音频，下一窗口重新转录
+                    committed = window_segments
+                    carry = np.zeros(0, dtype=np.float32)
+                    if not finished and len(window_segments) > 1:
+                        committed = window_segments[:-1]
+                        carry = buffer[int(window_segments[-1].start * SAMPLE_RATE):]
+
+                    for seg in committed:
+                        segment = TranscriptionSegment(
+                            start=round(seg.start + carry_offset, 2),
+                            end=round(seg.end + carry_offset, 2),
+                            text=seg.text.strip(),
+                        )
+                        segments.append(segment)
+                        task["segments"].append(segment)
+
+                    carry_offset += (len(buffer) - len(carry)) / SAMPLE_RATE
+                    if total_duration > 0:
+                        task["progress"] = min(
+                            90, 10 + int((carry_offset / total_duration) * 80)
+                        )
+                    notify(task)
+            except Exception:
+                proc.kill()
+                # 放行可能阻塞在队列上的读取线程
+                while not finished and blocks.get() is not None:
+                    pass
+                raise
+            finally:
+                proc.stdout.close()
+
+        stderr = proc.stderr.read().decode("utf-8", errors="replace")
+        if proc.wait() != 0:
+            raise RuntimeError(f"音频流解码失败: {stderr.strip()[-500:]}")
+
+        return TranscriptionResult(
+            text="\n".join(seg.text for seg in segments),
+            segments=segments,
+            language=language or "unknown",
+            duration=round(carry_offset, 2),
+        )
+
+    def _fetch_subtitles_sync(self, url: str, info: dict) -> TranscriptionResult | None:
+        """使用平台字幕生成转录（同步，线程池中运行），没有可用字幕或质量不合格时返回 None"""
+        languages = [
+            lang.strip() for lang in settings.subtitle_languages.split(",") if lang.strip()
+        ]
+        selected = select_track(info, languages, settings.subtitle_auto_captions)
+        if selected is None:
+            logger.info("没有可用字幕，使用 Whisper: %s", url)
+            return None
+        language, track, auto = selected
+
+        content = track.get("data")
+        if content is None:
+            with yt_dlp.YoutubeDL(build_ydl_opts(url)) as ydl:
+                content = ydl.urlopen(track["url"]).read().decode("utf-8", errors="replace")
+
+        segments = parse_subtitles(content, track["ext"])
+        duration = float(info.get("duration") or 0)
+        reason = check_quality(segments, duration, settings.subtitle_min_coverage)
+        if reason:
+            logger.info("字幕未通过质量检查，使用 Whisper: %s - %s", url, reason)
+            return None
+
+        logger.info("使用平台字幕: %s (%s, %s)", url, language, "自动" if auto else "人工")
+        return TranscriptionResult(
+            text="\n".join(seg.text for seg in segments),
+            segments=segments,
+            language=language,
+            duration=round(duration or segments[-1].end, 2),
+            source="auto_captions" if auto else "subtitles",
+        )
+
+    def _source_key(self, url: str | None, local_path: str | None) -> str:
+        """来源键：规范化视频 ID 或本地路径 + 模型大小"""
+        if local_path and os.path.isfile(local_path):
+            source = f"file:{os.path.abspath(local_path)}"
+        else:
+            source = f"url:{normalize_video_id(url or '')}"
+        return f"{source}:{settings.whisper_model_size}"
+
+    def _cache_get(self, key: str) -> TranscriptionResult | None:
+        data = _cache.get(key)
+        if data is None:
+            return None
+        return TranscriptionResult.model_validate_json(zlib.decompress(data))
+
+    def _cache_set(self, keys: list[str], result: TranscriptionResult) -> None:
+        data = zlib.compress(result.model_dump_json().encode("utf-8"))
+        for key in keys:
+            _cache.set(key, data)
+
     async def start(
         self,
         url: str | None = None,
         local_path: str | None = None,
+        priority: int = PRIORITY_NORMAL,
     ) -> str:
-        """开始转录任务，返回 task_id"""
+        """开始转录任务，返回 task_id
+
+        转录排队已满时抛出 SchedulerFull（路由返回 429）。
+        """
         task_id = str(uuid.uuid4())[:8]
+        source_key = self._source_key(url, local_path)
 
-        _tasks[task_id] = {
+        # 同一来源正在转录时共享同一个任务状态，只跑一次 Whisper
+        leader_id = _inflight.get(source_key)
+        if leader_id is not None and _tasks.alias(task_id, leader_id) is not None:
+            _cache_stats["coalesced"] += 1
+            logger.info("转录任务已合并: %s -> %s", task_id, leader_id)
+            return task_id
+
+        task = {
             "status": "processing",
             "progress": 0,
+            "queue_position": 0,
             "source": url or local_path,
+            "segments": [],
             "result": None,
         }
+        args = {
+            "source_key": source_key,
+            "url": url,
+            "local_path": local_path,
+            "priority": priority,
+        }
 
-        asyncio.create_task(self._run_transcription(task_id, url, local_path))
+        if get_job_backend() is not None:
+            # 队列模式：由队列后端按来源键去重，所有 API 副本的相同请求合并到同一任务
+            leader_id = await _tasks.submit(task_id, task, args, dedupe_key=source_key)
+            if leader_id != task_id:
+                _cache_stats["coalesced"] += 1
+                logger.info("转录任务已合并: %s -> %s", task_id, leader_id)
+                return task_id
+        else:
+            # 从接受到结束都计入转录类别，下载阶段排队的任务也占用名额
+            lane = get_lane("transcribe")
+            lane.admit()
+            _tasks.create(task_id, task)
+            _inflight[source_key] = task_id
+            job = asyncio.create_task(self._run_transcription(task_id, **args))
+            job.add_done_callback(lambda _: lane.leave())
 
         logger.info("转录任务已创建: %s", task_id)
         return task_id
 
+    async def run_job(self, task_id: str, task: dict, args: dict) -> None:
+        """在队列工作进程中执行转录任务"""
+        _tasks.create(task_id, task)
+        await self._run_transcription(task_id, **args)
+
     async def _run_transcription(
         self,
         task_id: str,
+        source_key: str,
         url: str | None,
         local_path: str | None,
+        priority: int = PRIORITY_NORMAL,
     ) -> None:
         """执行完整转录流程"""
-        task = _tasks.get(task_id)
+        task = await _tasks.get(task_id)
         if not task:
             return
 
-        loop = asyncio.get_event_loop()
-        os.makedirs(settings.temp_dir, exist_ok=True)
-        tmp_dir = tempfile.mkdtemp(dir=settings.temp_dir)
-
         try:
-            # 步骤 1: 获取音频文件
-            if local_path and os.path.isfile(local_path):
-                audio_path = local_path
-                task["progress"] = 10
-            elif url:
-                task["progress"] = 2
-                audio_path = await loop.run_in_executor(
-                    _executor, self._download_audio_sync, url, tmp_dir
-                )
-                task["progress"] = 10
-            else:
-                raise ValueError("请提供视频 URL 或本地文件路径")
-
-            # 步骤 2: Whisper 转录
-            result = await loop.run_in_executor(
-                _executor, self._transcribe_sync, audio_path, task
+            result = await self._transcribe_source(
+                task_id, task, source_key, url, local_path, priority
             )
 
+            result = await self._save_transcript(result)
+
+            task["segments"] = result.segments
             task["progress"] = 100
             task["status"] = "completed"
             task["result"] = result
@@ -147,34 +447,192 @@ class TranscribeService:
             task["progress"] = 0
             task["error"] = str(e)
 
-    async def get_progress(self, task_id: str) -> AsyncGenerator[dict, None]:
-        """SSE 推送转录进度"""
+        finally:
+            # 结果已写入缓存和转录存储，删除下载的音频等中间文件
+            get_storage_manager().release(task_id)
+            _inflight.pop(source_key, None)
+            await _tasks.finish(task_id)
+
+    async def _save_transcript(self, result: TranscriptionResult) -> TranscriptionResult:
+        """保存到服务端转录存储，后续问答/笔记请求只需传 transcript_id"""
+        loop = asyncio.get_event_loop()
+        transcript_id = await loop.run_in_executor(None, get_transcript_store().put, result)
+        return result.model_copy(update={"transcript_id": transcript_id})
+
+    async def _transcribe_source(
+        self,
+        task_id: str,
+        task: dict,
+        source_key: str,
+        url: str | None,
+        local_path: str | None,
+        priority: int = PRIORITY_NORMAL,
+    ) -> TranscriptionResult:
+        """获取音频并转录，优先命中缓存；下载和转录分别在调度器的对应类别中排队"""
+        loop = asyncio.get_event_loop()
+        is_local = bool(local_path and os.path.isfile(local_path))
+
+        # 步骤 0: 按视频 ID 查缓存（本地文件路径可能被覆盖，只按内容查）
+        info: dict | None = None
+        if not is_local:
+            if not url:
+                raise ValueError("请提供视频 URL 或本地文件路径")
+            cached = await loop.run_in_executor(None, self._cache_get, source_key)
+            if cached is not None:
+                _cache_stats["hits"] += 1
+                logger.info("转录缓存命中: %s", source_key)
+                return cached
+            # 复用预览时已提取的元数据
+            task["progress"] = 1
+            notify(task)
+            info = await self._video_service.get_info_dict(url, priority=priority)
+
+            # 字幕优先：平台已有字幕时不下载音频
+            if settings.transcribe_subtitles:
+                try:
+                    result = await get_lane("preview").run(
+                        self._fetch_subtitles_sync, url, info, priority=priority
+                    )
+                except Exception as e:
+                    logger.warning("字幕获取失败，使用 Whisper: %s - %s", url, e)
+                    result = None
+                if result is not None:
+                    _cache_stats["subtitles"] += 1
+                    await loop.run_in_executor(None, self._cache_set, [source_key], result)
+                    return result
+
+        # 流式模式：下载与转录重叠，不落地完整音频文件
+        if not is_local and settings.transcribe_streaming:
+            task["progress"] = 2
+            notify(task)
+            result = await get_lane("transcribe").run(
+                self._stream_transcribe_sync, url, task, info,
+                priority=priority, on_position=queue_reporter(task),
+            )
+            _cache_stats["misses"] += 1
+            await loop.run_in_executor(None, self._cache_set, [source_key], result)
+            return result
+
+        # 步骤 1: 获取音频文件
+        if is_local:
+            audio_path = local_path
+        else:
+            tmp_dir = await loop.run_in_executor(
+                None, get_storage_manager().create_workdir, task_id
+            )
+            task["progress"] = 2
+            notify(task)
+            audio_path = await get_lane("download").run(
+                self._download_audio_sync, url, tmp_dir, info,
+                priority=priority, on_position=queue_reporter(task),
+            )
+        task["progress"] = 10
+        notify(task)
+
+        # 步骤 2: 按音频内容查缓存
+        audio_hash = await loop.run_in_executor(None, _hash_file, audio_path)
+        audio_key = f"audio:{audio_hash}:{settings.whisper_model_size}"
+        cached = await loop.run_in_executor(None, self._cache_get, audio_key)
+        if cached is not None:
+            _cache_stats["hits"] += 1
+            logger.info("转录缓存命中: %s", audio_key)
+            if not is_local:
+                await loop.run_in_executor(
+                    None, self._cache_set, [source_key], cached
+                )
+            return cached
+        _cache_stats["misses"] += 1
+
+        # 步骤 3: Whisper 转录（配置多进程时切窗口并行）
+        transcribe_fn = (
+            self._transcribe_parallel_sync
+            if settings.whisper_parallel_workers > 1
+            else self._transcribe_sync
+        )
+        result = await get_lane("transcribe").run(
+            transcribe_fn, audio_path, task,
+            priority=priority, on_position=queue_reporter(task),
+        )
+
+        keys = [audio_key] if is_local else [audio_key, source_key]
+        await loop.run_in_executor(None, self._cache_set, keys, result)
+        return result
+
+    async def get_cached(self, url: str) -> TranscriptionResult | None:
+        """按视频 URL 查转录缓存，命中时保存到转录存储并返回（不创建任务）"""
+        loop = asyncio.get_event_loop()
+        cached = await loop.run_in_executor(
+            None, self._cache_get, self._source_key(url, None)
+        )
+        if cached is None:
+            return None
+        _cache_stats["hits"] += 1
+        return await self._save_transcript(cached)
+
+    async def get_progress(
+        self, task_id: str, cursor: int = 0
+    ) -> AsyncGenerator[dict, None]:
+        """SSE 推送转录进度及新解码的片段
+
+        cursor 为客户端已收到的片段数，断线重连时从该位置继续推送。
+        """
+        version = 0
         while True:
-            task = _tasks.get(task_id)
+            task = await _tasks.get(task_id)
             if not task:
                 yield {"status": "error", "message": "任务不存在", "progress": 0}
                 return
 
+            queue_position = task.get("queue_position", 0)
             msg = f"转录中... {task['progress']}%"
-            if task["progress"] < 10:
+            if task["status"] == "error":
+                msg = f"转录失败: {task.get('error', '')}"
+            elif queue_position:
+                msg = f"排队中，前面还有 {queue_position - 1} 个任务"
+            elif task["progress"] < 10:
                 msg = "正在下载音频..."
             elif task["progress"] >= 100:
                 msg = "转录完成"
 
+            segments = task["segments"]
+            new_segments = segments[cursor:]
+            cursor = max(cursor, len(segments))
+
             yield {
                 "status": task["status"],
                 "progress": task["progress"],
                 "message": msg,
+                "queue_position": queue_position,
+                "segments": [seg.model_dump() for seg in new_segments],
+                "cursor": cursor,
             }
 
             if task["status"] in ("completed", "error"):
                 return
 
-            await asyncio.sleep(0.5)
+            version = await wait_for_change(task, version)
 
     async def get_result(self, task_id: str) -> TranscriptionResult | None:
         """获取转录结果"""
-        task = _tasks.get(task_id)
+        task = await _tasks.get(task_id)
         if not task or task["status"] != "completed":
             return None
         return task["result"]
+
+    async def get_transcript(self, transcript_id: str) -> TranscriptionResult | None:
+        """按 transcript_id 读取服务端保存的转录"""
+        try:
+            return await load_transcript(transcript_id)
+        except LookupError:
+            return None
+
+    async def get_cache_stats(self) -> dict:
+        """转录缓存命中统计"""
+        loop = asyncio.get_event_loop()
+        usage = await loop.run_in_executor(None, _cache.stats)
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            **_cache_stats,
+            "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            **usage,
+        }
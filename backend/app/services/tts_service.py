@@ -1,34 +1,198 @@
 """TTS 服务 — CosyVoice2 语音合成"""
 
+import asyncio
+import hashlib
 import logging
+import os
+import re
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
 
 import httpx
 
 from app.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.http_client import get_http_client
+from app.utils.text import split_sentences
 
 logger = logging.getLogger(__name__)
 
+# 朗读前去掉的 Markdown 标记：标题、列表、引用、强调、行内代码、链接地址
+_MARKDOWN_LINE_RE = re.compile(r"^\s*(?:#{1,6}\s+|[-*+]\s+|\d+\.\s+|>\s*)", re.MULTILINE)
+_MARKDOWN_INLINE_RE = re.compile(r"[*_`~]+|!?\[([^\]]*)\]\([^)]*\)")
+_PAUSE_PUNCTUATION = set("。！？!?；;，,：:.")
+
+# 按句合成的音频缓存：(文本, 模型, 语速) -> MP3
+_cache = DiskCache(
+    os.path.join(settings.temp_dir, "cache", "tts.db"),
+    settings.tts_cache_max_mb * 1024 * 1024,
+)
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _strip_markdown(text: str) -> str:
+    text = _MARKDOWN_LINE_RE.sub("", text)
+    return _MARKDOWN_INLINE_RE.sub(lambda m: m.group(1) or "", text)
+
+
+def split_for_speech(text: str, max_chars: int) -> list[str]:
+    """把长文本切成适合逐段合成的片段：按句切分，过短的句子合并，超长的按字数硬切"""
+    pieces: list[str] = []
+    for sentence in split_sentences(_strip_markdown(text)):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if sentence[-1] not in _PAUSE_PUNCTUATION:
+            # 标题、列表项等按换行断开的短句补上句号，合成时保留停顿
+            sentence += "。"
+        if pieces and len(pieces[-1]) + len(sentence) <= max_chars:
+            pieces[-1] += sentence
+            continue
+        pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return pieces
+
+
+def _cache_key(text: str, speed: float) -> str:
+    raw = f"{settings.tts_model}\x00{speed:.2f}\x00mp3\x00{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 
 class TTSService:
 
+    def _build_request(self, text: str, speed: float | None) -> httpx.Request:
+        return get_http_client().build_request(
+            "POST",
+            f"{settings.openai_base_url}/audio/speech",
+            headers={
+                "Authorization": f"Bearer {settings.openai_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": settings.tts_model,
+                "input": text,
+                "response_format": "mp3",
+                "speed": speed or settings.tts_speed,
+            },
+        )
+
     async def synthesize(
         self,
         text: str,
         speed: float | None = None,
     ) -> bytes:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(
-                f"{settings.openai_base_url}/audio/speech",
-                headers={
-                    "Authorization": f"Bearer {settings.openai_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": settings.tts_model,
-                    "input": text,
-                    "response_format": "mp3",
-                    "speed": speed or settings.tts_speed,
-                },
-            )
+        """合成整段音频，相同文本、模型和语速直接返回缓存"""
+        speed = speed or settings.tts_speed
+        loop = asyncio.get_event_loop()
+        key = _cache_key(text, speed)
+        audio = await loop.run_in_executor(None, _cache.get, key)
+        if audio is not None:
+            _cache_stats["hits"] += 1
+            return audio
+
+        _cache_stats["misses"] += 1
+        resp = await get_http_client().send(self._build_request(text, speed))
+        resp.raise_for_status()
+        await loop.run_in_executor(None, _cache.set, key, resp.content)
+        return resp.content
+
+    async def synthesize_sentences(
+        self,
+        text: str,
+        speed: float | None = None,
+    ) -> AsyncIterator[bytes]:
+        """长文本按句流水线合成：有限并发预取后续片段，按原文顺序输出 MP3 片段
+
+        首个片段合成成功后才返回迭代器，上游错误仍可作为正常的错误响应返回；
+        之后的片段失败时重试一次，仍失败则抛出异常中断响应，客户端收到不完整的分块响应
+        而不是被静默截断的音频。
+        """
+        pieces = split_for_speech(text, settings.tts_segment_chars)
+        if not pieces:
+            raise ValueError("没有可朗读的文本")
+        logger.info("按句合成语音: %d 段", len(pieces))
+
+        # 滑动窗口：最多 tts_concurrency 个片段在合成或等待输出，内存占用有上限
+        pending: deque[tuple[str, asyncio.Task]] = deque()
+        next_index = 0
+
+        def fill() -> None:
+            nonlocal next_index
+            while next_index < len(pieces) and len(pending) < settings.tts_concurrency:
+                piece = pieces[next_index]
+                pending.append((piece, asyncio.ensure_future(self.synthesize(piece, speed))))
+                next_index += 1
+
+        fill()
+        try:
+            first = await pending.popleft()[1]
+        except BaseException:
+            for _, task in pending:
+                task.cancel()
+            raise
+        fill()
+        return self._iter_pipeline(first, pending, fill, speed)
+
+    async def _iter_pipeline(
+        self,
+        first: bytes,
+        pending: deque[tuple[str, asyncio.Task]],
+        fill: Callable[[], None],
+        speed: float | None,
+    ) -> AsyncGenerator[bytes, None]:
+        try:
+            yield first
+            while pending:
+                piece, task = pending.popleft()
+                try:
+                    audio = await task
+                except Exception as e:
+                    logger.warning("按句合成失败，重试: %s", e)
+                    try:
+                        audio = await self.synthesize(piece, speed)
+                    except Exception as e:
+                        logger.error("按句合成中断: %s", e)
+                        raise
+                fill()
+                yield audio
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def synthesize_stream(
+        self,
+        text: str,
+        speed: float | None = None,
+    ) -> AsyncIterator[bytes]:
+        """流式合成：确认上游响应成功后返回音频字节迭代器，边收边转发
+
+        上游出错时在返回前抛出 httpx.HTTPStatusError（连接失败、超时为 httpx.TransportError），
+        调用方仍可返回正常的错误响应；开始转发后上游中断时记录日志并抛出异常，
+        中止分块响应，客户端不会把截断的音频当作完整结果。
+        """
+        resp = await get_http_client().send(self._build_request(text, speed), stream=True)
+        if resp.is_error:
+            await resp.aread()
+            await resp.aclose()
             resp.raise_for_status()
-            return resp.content
+        return self._iter_audio(resp)
+
+    async def _iter_audio(self, resp: httpx.Response) -> AsyncGenerator[bytes, None]:
+        try:
+            async for chunk in resp.aiter_bytes():
+                yield chunk
+        except httpx.HTTPError as e:
+            logger.error("流式合成中断: %r", e)
+            raise
+        finally:
+            await resp.aclose()
+
+    async def get_cache_stats(self) -> dict:
+        """语音缓存命中统计"""
+        loop = asyncio.get_event_loop()
+        usage = await loop.run_in_executor(None, _cache.stats)
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            **_cache_stats,
+            "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            **usage,
+        }
@@ -2,17 +2,30 @@
 
 import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import time
+from collections import OrderedDict
 from urllib.parse import urlparse
 
+import httpx
 import yt_dlp
 
+from app.config import settings
+from app.core.http_client import get_http_client
+from app.core.scheduler import PRIORITY_INTERACTIVE, PRIORITY_NORMAL, get_lane
 from app.models.schemas import VideoInfo
-from app.utils.ytdlp import build_ydl_opts
+from app.utils.ytdlp import build_ydl_opts, normalize_video_id
 
 logger = logging.getLogger(__name__)
 
-_executor = ThreadPoolExecutor(max_workers=2)
+
+# 元数据缓存：规范视频 ID -> (提取时间, yt-dlp info)
+_info_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+# 进行中的提取：规范视频 ID -> Future，并发的相同请求共享一次提取
+_info_pending: dict[str, asyncio.Future] = {}
+# 已解析的短链接
+_short_links: dict[str, str] = {}
+
+_SHORT_LINK_HOSTS = ("b23.tv",)
 
 
 class VideoService:
@@ -26,16 +39,86 @@ class VideoService:
         return "unknown"
 
     def _extract_info_sync(self, url: str) -> dict:
-        opts = build_ydl_opts(url, {"skip_download": True, "no_playlist": True})
+        opts = build_ydl_opts(url, {"skip_download": True, "noplaylist": True})
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def _extract_playlist_sync(self, url: str) -> dict:
+        # 只展开列表条目，不逐个解析视频，一次请求拿到整个播放列表/频道
+        opts = build_ydl_opts(
+            url, {"skip_download": True, "noplaylist": False, "extract_flat": "in_playlist"}
+        )
         with yt_dlp.YoutubeDL(opts) as ydl:
             return ydl.extract_info(url, download=False)
 
+    async def _resolve_url(self, url: str) -> str:
+        """解析 b23.tv 等短链接为跳转后的完整 URL，失败时原样返回"""
+        host = urlparse(url).hostname or ""
+        if not any(host == h or host.endswith(f".{h}") for h in _SHORT_LINK_HOSTS):
+            return url
+        if url in _short_links:
+            return _short_links[url]
+
+        try:
+            client = get_http_client()
+            async with client.stream("GET", url, follow_redirects=True, timeout=10.0) as resp:
+                resolved = str(resp.url)
+        except httpx.HTTPError as e:
+            logger.warning("短链接解析失败: %s - %s", url, e)
+            return url
+
+        if len(_short_links) >= settings.video_info_cache_size:
+            _short_links.pop(next(iter(_short_links)))
+        _short_links[url] = resolved
+        return resolved
+
+    async def get_info_dict(self, url: str, priority: int = PRIORITY_INTERACTIVE) -> dict:
+        """获取 yt-dlp 提取的原始元数据
+
+        按规范视频 ID 缓存（TTL + 容量上限），并发的相同请求合并为一次提取；
+        转录和下载流程复用这里的结果，避免重复提取。priority 为在预览类别中排队的优先级，
+        转录任务传入自身的优先级，批量转录的逐条提取不会与交互预览同等竞争。
+        """
+        resolved = await self._resolve_url(url)
+        key = normalize_video_id(resolved)
+
+        cached = _info_cache.get(key)
+        if cached is not None:
+            if time.time() - cached[0] < settings.video_info_cache_ttl:
+                _info_cache.move_to_end(key)
+                return cached[1]
+            del _info_cache[key]
+
+        pending = _info_pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                get_lane("preview").run(
+                    self._extract_info_sync, resolved, priority=priority
+                )
+            )
+            _info_pending[key] = pending
+            pending.add_done_callback(lambda _: _info_pending.pop(key, None))
+        else:
+            logger.info("合并元数据提取请求: %s", key)
+
+        info = await asyncio.shield(pending)
+
+        _info_cache[key] = (time.time(), info)
+        _info_cache.move_to_end(key)
+        while len(_info_cache) > settings.video_info_cache_size:
+            _info_cache.popitem(last=False)
+        return info
+
     async def get_video_info(self, url: str) -> VideoInfo:
         platform = self._detect_platform(url)
         logger.info("获取视频信息: %s (平台: %s)", url, platform)
-
-        loop = asyncio.get_event_loop()
-        info = await loop.run_in_executor(_executor, self._extract_info_sync, url)
+        # 只对用户发起的预览做准入控制，转录/下载流程内部的提取不受限
+        lane = get_lane("preview")
+        lane.admit()
+        try:
+            info = await self.get_info_dict(url)
+        finally:
+            lane.leave()
 
         return VideoInfo(
             title=info.get("title", "未知标题"),
@@ -44,3 +127,46 @@ class VideoService:
             platform=platform,
             url=url,
         )
+
+    async def get_playlist_entries(self, url: str, max_items: int) -> tuple[str, list[dict]]:
+        """展开播放列表、频道或合集，返回 (标题, 条目列表)
+
+        条目只包含 url、title、duration；单个视频的链接返回只有一项的列表。
+        """
+        resolved = await self._resolve_url(url)
+        info = await get_lane("preview").run(
+            self._extract_playlist_sync, resolved, priority=PRIORITY_NORMAL
+        )
+
+        entries: list[dict] = []
+        seen: set[str] = set()
+
+        def collect(node: dict) -> None:
+            if len(entries) >= max_items:
+                return
+            children = node.get("entries")
+            if children is not None:
+                # 频道可能嵌套多个标签页/分P 列表
+                for child in children:
+                    if child:
+                        collect(child)
+                return
+            entry_url = node.get("webpage_url") or node.get("url") or ""
+            if not entry_url.startswith(("http://", "https://")):
+                if node.get("ie_key") == "Youtube" and entry_url:
+                    entry_url = f"https://www.youtube.com/watch?v={entry_url}"
+                else:
+                    return
+            key = normalize_video_id(entry_url)
+            if key in seen:
+                return
+            seen.add(key)
+            entries.append({
+                "url": entry_url,
+                "title": node.get("title") or entry_url,
+                "duration": int(node.get("duration") or 0),
+            })
+
+        collect(info)
+        logger.info("展开播放列表: %s (%d 项)", url, len(entries))
+        return info.get("title") or url, entries
@@ -0,0 +1,151 @@
+"""音频处理工具 — 窗口切分与转录片段拼接"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class AudioWindow:
+    """待转录的音频窗口（采样点区间），keep_from/keep_to 为保留片段的全局时间范围（秒）"""
+
+    start: int
+    end: int
+    keep_from: float
+    keep_to: float
+
+    @property
+    def offset(self) -> float:
+        return self.start / SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) / SAMPLE_RATE
+
+
+def _pack_speech(speech: list[dict], max_len: int) -> list[tuple[int, int]]:
+    """把语音段依次装入不超过 max_len 的区间，装不下就开新区间（只在语音段之间的静音处分开）"""
+    spans: list[tuple[int, int]] = []
+    for ts in speech:
+        if spans and ts["end"] - spans[-1][0] <= max_len:
+            spans[-1] = (spans[-1][0], ts["end"])
+        else:
+            spans.append((ts["start"], ts["end"]))
+    return spans
+
+
+def split_windows(
+    audio: np.ndarray,
+    window_seconds: float,
+    overlap_seconds: float = 2.0,
+) -> list[AudioWindow]:
+    """按 VAD 静音边界把音频切成约 window_seconds 的窗口
+
+    切点只落在静音中点：连续语音超过窗口长度时，在该段内按更短的停顿（100ms）重新切分；
+    仍找不到停顿的语音保留为一个超长窗口，不在语音中间硬切。
+    每个窗口向两侧各多送 overlap_seconds / 2 的音频作为上下文，拼接时按片段中点归属窗口。
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    total = len(audio)
+    max_len = int(window_seconds * SAMPLE_RATE)
+    pad = int(overlap_seconds * SAMPLE_RATE) // 2
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+
+    # 1. 在静音处切分：把语音段依次装入窗口
+    spans: list[tuple[int, int]] = []
+    for start, end in _pack_speech(speech, max_len):
+        if end - start <= max_len:
+            spans.append((start, end))
+            continue
+        # 2. 单段语音过长：按更短的停顿重新检测，在段内的静音处切分
+        inner = get_speech_timestamps(
+            audio[start:end], VadOptions(min_silence_duration_ms=100)
+        )
+        inner = [{"start": ts["start"] + start, "end": ts["end"] + start} for ts in inner]
+        spans.extend(_pack_speech(inner, max_len) or [(start, end)])
+
+    # 3. 切点取相邻区间之间静音的中点
+    bounds: list[int] = [0]
+    for (_, prev_end), (next_start, _) in zip(spans, spans[1:]):
+        bounds.append((prev_end + next_start) // 2)
+    bounds.append(total)
+
+    return [
+        AudioWindow(
+            max(start - pad, 0),
+            min(end + pad, total),
+            start / SAMPLE_RATE,
+            end / SAMPLE_RATE,
+        )
+        for start, end in zip(bounds, bounds[1:])
+        if end > start
+    ]
+
+
+def stitch_segments(
+    window: AudioWindow,
+    segments: list[tuple[float, float, str]],
+) -> list[tuple[float, float, str]]:
+    """把窗口内的片段换算为全局时间，只保留中点落在本窗口保留范围内的片段
+
+    相邻窗口的上下文音频互相重叠，同一片段可能在两个窗口都被转出；按中点归属保证
+    每个片段只保留一次，跨过切点的片段也不会被两边同时丢弃。
+    """
+    stitched: list[tuple[float, float, str]] = []
+    for start, end, text in segments:
+        global_start = start + window.offset
+        global_end = end + window.offset
+        middle = (global_start + global_end) / 2
+        if not window.keep_from <= middle < window.keep_to:
+            continue
+        stitched.append((global_start, global_end, text))
+    return stitched
+
+
+def open_pcm_stream(
+    source: str, headers: dict[str, str] | None = None
+) -> subprocess.Popen:
+    """启动 ffmpeg，把音频源（本地文件或媒体 URL）解码为 16kHz 单声道 s16le PCM 输出到管道"""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if headers:
+        cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+    cmd += ["-i", source, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def transcode_to_mp3(source: str, target: str, bitrate: str = "192k") -> None:
+    """用 ffmpeg 从视频文件提取音频转为 MP3，先写临时文件，完成后再改名"""
+    partial = f"{target}.part"
+    proc = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source,
+         "-vn", "-codec:a", "libmp3lame", "-b:a", bitrate, "-f", "mp3", partial],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"音频转码失败: {stderr.strip()[-500:]}")
+    os.replace(partial, target)
+
+
+def read_pcm_blocks(stream: IO[bytes], seconds: float) -> Iterator[np.ndarray]:
+    """从 PCM 管道按固定时长读取 float32 音频块，最后一块可能不足"""
+    import numpy as np
+
+    block_bytes = int(seconds * SAMPLE_RATE) * 2
+    while True:
+        data = stream.read(block_bytes)
+        if not data:
+            return
+        samples = np.frombuffer(data[: len(data) // 2 * 2], dtype=np.int16)
+        yield samples.astype(np.float32) / 32768.0
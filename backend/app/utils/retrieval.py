@@ -0,0 +1,77 @@
+"""转录检索工具 — 基于 BM25 的本地段落检索"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from app.utils.text import TextChunk, chunk_by_tokens, chunk_segments
+
+if TYPE_CHECKING:
+    from app.models.schemas import TranscriptionSegment
+
+_LATIN_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """检索分词：英文按单词，中日韩文本按字二元组（单字成词时保留单字）"""
+    text = text.lower()
+    tokens = _LATIN_WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """转录段落的 BM25 倒排索引，构建一次后可重复查询"""
+
+    def __init__(self, passages: list[TextChunk], k1: float = 1.5, b: float = 0.75) -> None:
+        self.passages = passages
+        self._k1 = k1
+        self._b = b
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._lengths: list[int] = []
+
+        for doc_id, passage in enumerate(passages):
+            counts = Counter(tokenize(passage.text))
+            self._lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                self._postings.setdefault(term, []).append((doc_id, freq))
+
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    @classmethod
+    def from_segments(
+        cls, segments: list[TranscriptionSegment], passage_tokens: int = 300
+    ) -> BM25Index:
+        """按片段边界把转录打包成带时间范围的段落并建索引"""
+        return cls(chunk_segments(segments, max_tokens=passage_tokens, overlap_tokens=0))
+
+    @classmethod
+    def from_text(cls, text: str, passage_tokens: int = 300) -> BM25Index:
+        """没有片段时间信息时，按句子边界切段落建索引"""
+        return cls(chunk_by_tokens(text, max_tokens=passage_tokens, overlap_tokens=0))
+
+    def search(self, query: str, top_k: int = 6) -> list[TextChunk]:
+        """返回与问题最相关的段落（按原文顺序排列）"""
+        total = len(self.passages)
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings:
+                norm = 1 - self._b + self._b * self._lengths[doc_id] / self._avg_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * (
+                    freq * (self._k1 + 1) / (freq + self._k1 * norm)
+                )
+
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:top_k]
+        return [self.passages[doc_id] for doc_id in sorted(best)]
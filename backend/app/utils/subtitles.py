@@ -0,0 +1,151 @@
+"""平台字幕工具 — 选择字幕轨道，解析 VTT/SRT/JSON 字幕为转录片段"""
+
+import html
+import json
+import re
+
+from app.models.schemas import TranscriptionSegment
+
+# 按偏好顺序尝试的字幕格式（均可解析）
+SUBTITLE_FORMATS = ("json3", "vtt", "srt", "json")
+
+_TIMING_RE = re.compile(
+    r"((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})"
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+# 非语音轨道：弹幕、直播聊天
+_NON_SPEECH_TRACKS = ("danmaku", "live_chat", "rechat")
+
+
+def _parse_timestamp(value: str) -> float:
+    parts = value.replace(",", ".").split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _segment(start: float, end: float, text: str) -> TranscriptionSegment:
+    return TranscriptionSegment(start=round(start, 2), end=round(end, 2), text=text)
+
+
+def parse_timed_text(content: str) -> list[TranscriptionSegment]:
+    """解析 WebVTT / SRT 字幕
+
+    自动字幕常用滚动显示：每条包含上一条的末行，只保留相对上一条新增的行。
+    """
+    segments: list[TranscriptionSegment] = []
+    previous: list[str] = []
+    for block in re.split(r"\n\s*\n", content.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            match = _TIMING_RE.search(line)
+            if match:
+                break
+        else:
+            continue
+
+        text_lines = [
+            html.unescape(_TAG_RE.sub("", line)).strip() for line in lines[i + 1:]
+        ]
+        text_lines = [line for line in text_lines if line]
+        new_lines = [line for line in text_lines if line not in previous]
+        if text_lines:
+            previous = text_lines
+        if not new_lines:
+            continue
+
+        start, end = _parse_timestamp(match.group(1)), _parse_timestamp(match.group(2))
+        text = " ".join(new_lines)
+        if segments and segments[-1].text == text:
+            continue
+        segments.append(_segment(start, end, text))
+    return segments
+
+
+def parse_json_subtitles(content: str) -> list[TranscriptionSegment]:
+    """解析 JSON 字幕：B 站（body[].from/to/content）与 YouTube json3（events[].segs）"""
+    data = json.loads(content)
+    segments: list[TranscriptionSegment] = []
+
+    for item in data.get("body") or []:
+        text = (item.get("content") or "").strip()
+        if text:
+            segments.append(_segment(float(item["from"]), float(item["to"]), text))
+
+    for event in data.get("events") or []:
+        text = "".join(seg.get("utf8", "") for seg in event.get("segs") or []).strip()
+        if not text:
+            continue
+        start = event.get("tStartMs", 0) / 1000
+        segments.append(_segment(start, start + event.get("dDurationMs", 0) / 1000, text))
+
+    return segments
+
+
+def parse_subtitles(content: str, ext: str) -> list[TranscriptionSegment]:
+    """按格式解析字幕内容"""
+    if ext in ("json", "json3"):
+        return parse_json_subtitles(content)
+    return parse_timed_text(content)
+
+
+def select_track(
+    info: dict, languages: list[str], allow_auto: bool
+) -> tuple[str, dict, bool] | None:
+    """选出最合适的字幕轨道，返回 (语言, 格式条目, 是否自动字幕)
+
+    人工字幕优先，按 languages 顺序匹配（"zh" 可匹配 "zh-Hans" 等），没有匹配时取任意人工字幕；
+    自动字幕只使用视频原始语言的轨道，不使用平台机器翻译的轨道。
+    """
+
+    def pick_format(tracks: list[dict]) -> dict | None:
+        for ext in SUBTITLE_FORMATS:
+            for track in tracks:
+                if track.get("ext") == ext and (track.get("url") or track.get("data")):
+                    return track
+        return None
+
+    def match(available: dict, wanted: list[str]) -> tuple[str, dict] | None:
+        for lang in wanted:
+            for key, tracks in available.items():
+                if key == lang or key.startswith(f"{lang}-"):
+                    track = pick_format(tracks or [])
+                    if track is not None:
+                        return key, track
+        return None
+
+    manual = {
+        key: tracks
+        for key, tracks in (info.get("subtitles") or {}).items()
+        if key not in _NON_SPEECH_TRACKS
+    }
+    found = match(manual, languages) or match(manual, list(manual))
+    if found:
+        return found[0], found[1], False
+
+    if allow_auto:
+        auto = info.get("automatic_captions") or {}
+        original = [key for key in auto if key.endswith("-orig")]
+        if info.get("language"):
+            original.append(info["language"])
+        found = match(auto, original)
+        if found:
+            return found[0].removesuffix("-orig"), found[1], True
+    return None
+
+
+def check_quality(
+    segments: list[TranscriptionSegment], duration: float, min_coverage: float
+) -> str | None:
+    """字幕质量检查，通过返回 None，否则返回原因
+
+    片段过少，或字幕覆盖的时间跨度明显短于视频（只有片头字幕等）时不采用。
+    """
+    if len(segments) < 3:
+        return "字幕片段过少"
+    if duration > 0:
+        covered = segments[-1].end - segments[0].start
+        if covered < duration * min_coverage:
+            return f"字幕只覆盖 {covered:.0f}/{duration:.0f} 秒"
+    return None
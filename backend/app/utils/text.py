@@ -1,5 +1,20 @@
 """文本处理工具"""
 
+from __future__ import annotations
+
+import math
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.models.schemas import TranscriptionSegment
+
+# 句末标点之后或换行处断句
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]*(?:[。！？!?；;]+|\n+|$)")
+_LATIN_SENTENCE_END_RE = re.compile(r"(?<=\.)(?=\s)")
+
 
 def truncate_text(text: str, max_length: int = 500) -> str:
     """截断文本"""
@@ -22,3 +37,130 @@ def chunk_text(text: str, chunk_size: int = 3000, overlap: int = 200) -> list[st
         start = end - overlap
 
     return chunks
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本 token 数（CJK 字符约 1 token，其余约 4 字符 1 token）
+
+    CJK 字符的 UTF-8 编码为 3 字节、ASCII 为 1 字节，据此由字节数反推 CJK 字符数，
+    避免逐字符匹配。
+    """
+    cjk = (len(text.encode("utf-8")) - len(text)) // 2
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def format_timestamp(seconds: float) -> str:
+    """秒数格式化为 mm:ss 或 h:mm:ss"""
+    total = int(seconds)
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def split_sentences(text: str) -> list[str]:
+    """按句末标点和换行断句，保留原文标点"""
+    sentences: list[str] = []
+    for match in _SENTENCE_RE.finditer(text):
+        # 英文句号只在其后有空白时断句，避免拆开小数和缩写
+        for piece in _LATIN_SENTENCE_END_RE.split(match.group()):
+            if piece.strip():
+                sentences.append(piece)
+            elif piece and sentences:
+                sentences[-1] += piece
+    return sentences
+
+
+@dataclass
+class TextChunk:
+    """按 token 预算打包的文本块，来自转录片段时带时间范围（秒）"""
+
+    text: str
+    tokens: int
+    start: float | None = None
+    end: float | None = None
+
+    @property
+    def label(self) -> str:
+        """时间范围标签，如 [01:00-05:30]；无时间信息时为空"""
+        if self.start is None or self.end is None:
+            return ""
+        return f"[{format_timestamp(self.start)}-{format_timestamp(self.end)}]"
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    """把超出预算的单句按估算长度硬切"""
+    tokens = estimate_tokens(text)
+    parts = math.ceil(tokens / max_tokens)
+    size = math.ceil(len(text) / parts)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _pack(
+    units: Iterable[tuple[str, float | None, float | None]],
+    max_tokens: int,
+    overlap_tokens: int,
+    separator: str,
+) -> list[TextChunk]:
+    """把 (文本, 起, 止) 单元顺序装入不超过 max_tokens 的块（含重叠），块首重复上一块末尾约 overlap_tokens"""
+    chunks: list[TextChunk] = []
+    current: list[tuple[str, int, float | None, float | None]] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        chunks.append(
+            TextChunk(
+                text=separator.join(u[0] for u in current),
+                tokens=current_tokens,
+                start=current[0][2],
+                end=current[-1][3],
+            )
+        )
+
+    for text, start, end in units:
+        pieces = [text]
+        tokens = estimate_tokens(text)
+        if tokens > max_tokens:
+            pieces = _split_oversized(text, max_tokens)
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) if len(pieces) > 1 else tokens
+            if current and current_tokens + piece_tokens > max_tokens:
+                flush()
+                # 从末尾回溯保留重叠单元
+                # 重叠计入预算：重叠加上新单元仍不能超过 max_tokens
+                kept: list[tuple[str, int, float | None, float | None]] = []
+                kept_tokens = 0
+                limit = min(overlap_tokens, max_tokens - piece_tokens)
+                for unit in reversed(current):
+                    if kept_tokens + unit[1] > limit:
+                        break
+                    kept.append(unit)
+                    kept_tokens += unit[1]
+                current = kept[::-1]
+                current_tokens = kept_tokens
+            current.append((piece, piece_tokens, start, end))
+            current_tokens += piece_tokens
+
+    if current:
+        flush()
+    return chunks
+
+
+def chunk_by_tokens(
+    text: str, max_tokens: int = 8000, overlap_tokens: int = 100
+) -> list[TextChunk]:
+    """按估算 token 预算分块，只在句子边界切分（线性时间）"""
+    units = ((sentence, None, None) for sentence in split_sentences(text))
+    return _pack(units, max_tokens, overlap_tokens, separator="")
+
+
+def chunk_segments(
+    segments: list[TranscriptionSegment],
+    max_tokens: int = 8000,
+    overlap_tokens: int = 100,
+) -> list[TextChunk]:
+    """按估算 token 预算打包转录片段，只在片段边界切分，块带时间范围"""
+    units = ((seg.text, seg.start, seg.end) for seg in segments)
+    return _pack(units, max_tokens, overlap_tokens, separator="\n")
@@ -1,6 +1,7 @@
 import logging
 import os
-from urllib.parse import urlparse
+import re
+from urllib.parse import parse_qs, urlparse
 
 from app.config import settings
 
@@ -12,6 +13,40 @@ def _is_bilibili(url: str) -> bool:
     return "bilibili" in host or "b23.tv" in host
 
 
+_YOUTUBE_ID_RE = re.compile(r"^[0-9A-Za-z_-]{11}$")
+_BILIBILI_ID_RE = re.compile(r"(BV[0-9A-Za-z]{10}|av\d+)", re.IGNORECASE)
+
+
+def normalize_video_id(url: str) -> str:
+    """提取规范化视频 ID（如 youtube:xxx、bilibili:BVxxx），无法识别时返回去掉查询参数的 URL"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    path = parsed.path.rstrip("/")
+    query = parse_qs(parsed.query)
+
+    if host == "youtu.be" or host.endswith(".youtu.be"):
+        video_id = path.lstrip("/").split("/")[0]
+        if _YOUTUBE_ID_RE.match(video_id):
+            return f"youtube:{video_id}"
+    elif "youtube" in host:
+        video_id = query.get("v", [""])[0]
+        if not video_id:
+            parts = path.split("/")
+            if len(parts) >= 3 and parts[1] in ("shorts", "embed", "live", "v"):
+                video_id = parts[2]
+        if _YOUTUBE_ID_RE.match(video_id):
+            return f"youtube:{video_id}"
+    elif "bilibili" in host:
+        match = _BILIBILI_ID_RE.search(path)
+        if match:
+            video_id = match.group(1)
+            video_id = video_id if video_id.startswith("BV") else video_id.lower()
+            page = query.get("p", ["1"])[0]
+            return f"bilibili:{video_id}" if page == "1" else f"bilibili:{video_id}:p{page}"
+
+    return f"{host}{path}" if host else url.strip()
+
+
 def build_ydl_opts(url: str, extra_opts: dict | None = None) -> dict:
     opts: dict = {
         "quiet": True,
@@ -37,3 +72,12 @@ def build_ydl_opts(url: str, extra_opts: dict | None = None) -> dict:
         opts.update(extra_opts)
 
     return opts
+
+
+def process_info(ydl, url: str, info: dict | None, download: bool) -> dict:
+    """复用已提取的元数据做格式选择/下载（同 --load-info-json），没有元数据时重新提取"""
+    if info is None:
+        return ydl.extract_info(url, download=download)
+    return ydl.process_ie_result(
+        ydl.sanitize_info(info, remove_private_keys=True), download=download
+    )
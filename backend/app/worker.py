@@ -0,0 +1,118 @@
+"""VideoNote 任务工作进程 — 队列模式下消费转录/笔记/下载任务
+
+用法：JOB_QUEUE=sqlite uv run python -m app.worker
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.core.job_queue import Job, get_job_backend
+from app.core.storage import get_storage_manager
+from app.core.task_store import TaskStore
+from app.core.whisper_client import WhisperModelPool
+from app.services.download_service import DownloadService
+from app.services.note_service import NoteService
+from app.services.transcribe_service import TranscribeService
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[str, dict, dict], Awaitable[None]]
+
+
+class Worker:
+    """从队列后端认领任务并执行，定期发布任务状态、续约租约"""
+
+    def __init__(self) -> None:
+        backend = get_job_backend()
+        if backend is None:
+            raise SystemExit("未配置任务队列后端，请设置 JOB_QUEUE=sqlite")
+        self._backend = backend
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: dict[str, JobHandler] = {
+            "transcribe": TranscribeService().run_job,
+            "note": NoteService().run_job,
+            "download": DownloadService().run_job,
+        }
+        self._running: dict[int, Job] = {}
+        self._publisher: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        """主循环：有空闲并发槽时认领任务"""
+        logger.info("工作进程启动: %s (并发 %d)", self._worker_id, settings.worker_concurrency)
+        get_storage_manager().cleanup()
+        if settings.whisper_preload:
+            WhisperModelPool.preload_in_background()
+        loop = asyncio.get_event_loop()
+        slots = asyncio.Semaphore(settings.worker_concurrency)
+        self._start_publisher()
+
+        try:
+            while True:
+                await slots.acquire()
+                job = await loop.run_in_executor(
+                    None, self._backend.claim, list(self._handlers), self._worker_id
+                )
+                if job is None:
+                    slots.release()
+                    await asyncio.sleep(settings.job_poll_interval)
+                    continue
+                asyncio.create_task(self._execute(job, slots))
+        finally:
+            self._publisher.cancel()
+
+    def _start_publisher(self) -> None:
+        self._publisher = asyncio.create_task(self._publish_loop())
+        self._publisher.add_done_callback(self._on_publisher_done)
+
+    def _on_publisher_done(self, task: asyncio.Task) -> None:
+        """发布循环意外退出时重新启动，否则进行中任务的租约会过期并被重复执行"""
+        if task.cancelled():
+            return
+        logger.error("状态发布循环退出，重新启动: %s", task.exception())
+        self._start_publisher()
+
+    async def _execute(self, job: Job, slots: asyncio.Semaphore) -> None:
+        logger.info("执行任务: %s/%s", job.kind, job.task_id)
+        self._running[job.id] = job
+        try:
+            await self._handlers[job.kind](
+                job.task_id, job.payload["task"], job.payload["args"]
+            )
+        except Exception as e:
+            logger.error("任务执行异常: %s/%s - %s", job.kind, job.task_id, e)
+        finally:
+            self._running.pop(job.id, None)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._backend.complete, job.id
+                )
+            except Exception as e:
+                logger.error("任务完成登记失败: %s/%s - %s", job.kind, job.task_id, e)
+            slots.release()
+
+    async def _publish_loop(self) -> None:
+        """定期发布进行中任务的状态，并为其续约；单次失败（如数据库繁忙）只记录日志"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                for store in TaskStore.instances.values():
+                    await store.publish_running()
+                await loop.run_in_executor(
+                    None, self._backend.heartbeat, list(self._running)
+                )
+            except Exception as e:
+                logger.error("发布任务状态失败: %s", e)
+            await asyncio.sleep(settings.job_poll_interval)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(Worker().run())
+
+
+if __name__ == "__main__":
+    main()
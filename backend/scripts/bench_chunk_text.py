@@ -0,0 +1,71 @@
+"""分块基准：对比按字符切分的 chunk_text 与按 token 预算切分的 chunk_by_tokens
+
+用法（在 backend 目录下）：
+    uv run python -m scripts.bench_chunk_text [--mb 4]
+"""
+
+import argparse
+import random
+import time
+
+from app.utils.text import chunk_by_tokens, chunk_text, estimate_tokens
+
+ZH_SENTENCES = [
+    "今天我们来聊一聊分布式系统里的一致性问题。",
+    "这个方案的核心在于把写请求先落到日志里，再异步地复制到各个副本。",
+    "大家可以看到，延迟主要来自跨机房的网络往返！",
+    "那么问题来了，如果主节点宕机了怎么办？",
+]
+EN_SENTENCES = [
+    "Today we are going to talk about consistency in distributed systems.",
+    "The key idea is to append every write to a log and replicate it asynchronously.",
+    "As you can see, most of the latency comes from cross-region round trips!",
+    "So what happens when the leader goes down?",
+]
+
+
+def make_transcript(target_bytes: int, mix: float, seed: int = 0) -> str:
+    """生成按行排列的模拟转录文本，mix 为英文句子占比"""
+    rng = random.Random(seed)
+    lines: list[str] = []
+    size = 0
+    while size < target_bytes:
+        pool = EN_SENTENCES if rng.random() < mix else ZH_SENTENCES
+        line = "".join(rng.choice(pool) for _ in range(rng.randint(1, 3)))
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+def bench(name: str, fn, text: str) -> None:
+    start = time.perf_counter()
+    chunks = fn(text)
+    elapsed = time.perf_counter() - start
+    tokens = [estimate_tokens(c) for c in chunks]
+    mb = len(text.encode("utf-8")) / 1024 / 1024
+    print(
+        f"  {name:<16} chunks={len(chunks):>5}  "
+        f"tokens/chunk avg={sum(tokens) / len(tokens):>7.0f} max={max(tokens):>6}  "
+        f"{mb / elapsed:>7.1f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=4.0, help="模拟转录文本大小（MB）")
+    parser.add_argument("--tokens", type=int, default=8000, help="chunk_by_tokens 预算")
+    args = parser.parse_args()
+
+    for label, mix in (("中文", 0.0), ("英文", 1.0), ("中英混合", 0.5)):
+        text = make_transcript(int(args.mb * 1024 * 1024), mix)
+        print(f"{label} ({len(text)} 字符, 估算 {estimate_tokens(text)} tokens)")
+        bench("chunk_text", lambda t: chunk_text(t, chunk_size=8000, overlap=200), text)
+        bench(
+            "chunk_by_tokens",
+            lambda t: [c.text for c in chunk_by_tokens(t, max_tokens=args.tokens)],
+            text,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""文件下载接口基准：对比 Starlette FileResponse 与 RangedFileResponse 的吞吐和每 GB CPU 时间
+
+用法（在 backend 目录下）：
+    uv run python -m scripts.bench_file_serving [--size-mb 1024] [--runs 3] [--ranges 200]
+
+每种实现各启动一个 uvicorn 子进程，客户端在本进程中下载同一个文件；服务端 CPU 时间由子进程
+退出时的 rusage 得到，并减去只启动不下载的空载开销。--ranges 另测随机 1MB 区间请求（模拟拖动播放）。
+"""
+
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+
+from app.utils.file_response import RangedFileResponse
+
+# 子进程中由环境变量指定待发送的文件
+app = FastAPI()
+_BENCH_FILE = os.environ.get("BENCH_FILE", "")
+
+
+@app.get("/plain")
+async def plain() -> FileResponse:
+    return FileResponse(_BENCH_FILE)
+
+
+@app.get("/ranged")
+async def ranged() -> RangedFileResponse:
+    return RangedFileResponse(_BENCH_FILE)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(path: str, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "scripts.bench_file_serving:app",
+         "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "BENCH_FILE": path},
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("uvicorn 启动超时")
+
+
+def _stop_server(proc: subprocess.Popen) -> float:
+    """停止服务端子进程，返回其 CPU 时间（用户 + 系统，秒）"""
+    proc.send_signal(signal.SIGINT)
+    _, _, usage = os.wait4(proc.pid, 0)
+    proc.returncode = 0
+    return usage.ru_utime + usage.ru_stime
+
+
+def _download(client: httpx.Client, url: str) -> int:
+    total = 0
+    with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_bytes(1024 * 1024):
+            total += len(chunk)
+    return total
+
+
+def _bench(path: str, endpoint: str, runs: int, ranges: int, baseline: float) -> None:
+    size = os.path.getsize(path)
+    port = _free_port()
+    proc = _start_server(path, port)
+    url = f"http://127.0.0.1:{port}/{endpoint}"
+    try:
+        with httpx.Client(timeout=None) as client:
+            start = time.perf_counter()
+            for _ in range(runs):
+                if _download(client, url) != size:
+                    raise RuntimeError("下载长度不一致")
+            elapsed = time.perf_counter() - start
+
+            range_start = time.perf_counter()
+            for _ in range(ranges):
+                offset = random.randrange(0, max(1, size - 1024 * 1024))
+                headers = {"Range": f"bytes={offset}-{offset + 1024 * 1024 - 1}"}
+                resp = client.get(url, headers=headers)
+                if resp.status_code != 206:
+                    raise RuntimeError(f"区间请求返回 {resp.status_code}")
+            range_elapsed = time.perf_counter() - range_start
+    finally:
+        cpu = max(0.0, _stop_server(proc) - baseline)
+
+    gigabytes = (size * runs + 1024 * 1024 * ranges) / 1024**3
+    line = (
+        f"  {endpoint:<7} {size * runs / elapsed / 1024**2:>8.0f} MB/s  "
+        f"CPU {cpu / gigabytes:>6.2f} s/GB"
+    )
+    if ranges:
+        line += f"  区间请求平均 {range_elapsed / ranges * 1000:>6.1f} ms"
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=1024, help="测试文件大小")
+    parser.add_argument("--runs", type=int, default=3, help="每种实现完整下载的次数")
+    parser.add_argument("--ranges", type=int, default=200, help="随机 1MB 区间请求次数")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(block)
+        f.flush()
+
+        # 空载开销：启动并立即停止服务端
+        proc = _start_server(f.name, _free_port())
+        baseline = _stop_server(proc)
+
+        print(f"文件 {args.size_mb} MB, 完整下载 {args.runs} 次, 区间请求 {args.ranges} 次")
+        for endpoint in ("plain", "ranged"):
+            _bench(f.name, endpoint, args.runs, args.ranges, baseline)
+
+
+if __name__ == "__main__":
+    main()
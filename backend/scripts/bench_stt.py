@@ -0,0 +1,66 @@
+"""语音识别延迟基准：对比远程接口与本地 Whisper 模型识别同一段短音频
+
+用法（在 backend 目录下）：
+    uv run python -m scripts.bench_stt question.webm [--runs 10] [--engines local,remote]
+
+本地模式首次调用包含模型加载时间，单独列出，不计入统计。
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app.config import settings
+from app.services.stt_service import STTService
+
+
+async def bench(service: STTService, engine: str, audio: bytes, filename: str, runs: int) -> None:
+    async def once() -> str:
+        if engine == "local":
+            return await service.transcribe_local(audio)
+        return await service.transcribe_remote(audio, filename)
+
+    start = time.perf_counter()
+    text = await once()
+    first = time.perf_counter() - start
+
+    latencies: list[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await once()
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"  {engine:<7} first={first * 1000:>7.0f}ms  "
+        f"p50={statistics.median(latencies) * 1000:>7.0f}ms  "
+        f"p95={p95 * 1000:>7.0f}ms  text={text[:40]!r}"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    with open(args.audio, "rb") as f:
+        audio = f.read()
+    service = STTService()
+    print(
+        f"音频 {args.audio} ({len(audio) / 1024:.0f} KB), 每种引擎 {args.runs} 次, "
+        f"本地模型 {settings.stt_local_model_size}, 远程模型 {settings.stt_model}"
+    )
+    for engine in args.engines.split(","):
+        await bench(service, engine.strip(), audio, os.path.basename(args.audio), args.runs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("audio", help="待识别的短音频文件（webm/wav/mp3 等）")
+    parser.add_argument("--runs", type=int, default=10, help="每种引擎的计时次数")
+    parser.add_argument("--engines", default="local,remote", help="逗号分隔: local, remote")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""调度器准入控制：已接受未结束的任务超过 并发数 + 排队上限 时拒绝（路由返回 429）"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.scheduler import JobLane, Scheduler, SchedulerFull, get_lane
+from app.routers import transcribe
+from app.services import transcribe_service
+
+
+@pytest.fixture
+def lanes(monkeypatch):
+    """小容量的调度器：转录 1 并发、排队上限 2，下载 1 并发"""
+    monkeypatch.setattr(settings, "scheduler_max_queued", 2)
+    monkeypatch.setattr(settings, "scheduler_transcribe_workers", 1)
+    monkeypatch.setattr(settings, "scheduler_download_workers", 1)
+    monkeypatch.setattr(settings, "job_queue", "")
+    monkeypatch.setattr(Scheduler, "_lanes", None)
+    monkeypatch.setattr(transcribe_service, "_inflight", {})
+    yield
+    Scheduler._lanes = None
+
+
+def test_admit_counts_until_leave():
+    lane = JobLane("test", workers=1, max_queued=2)
+    for _ in range(3):
+        lane.admit()
+    with pytest.raises(SchedulerFull):
+        lane.admit()
+    lane.leave()
+    lane.admit()
+    assert lane.stats()["admitted"] == 3
+
+
+def test_start_rejects_jobs_waiting_in_download_lane(lanes, monkeypatch):
+    """任务还在下载类别排队时也占用转录名额，超出后 start 抛出 SchedulerFull"""
+
+    async def scenario() -> tuple[int, int]:
+        release = asyncio.Event()
+
+        async def download_blocked(self, task_id, task, source_key, url, local_path, priority):
+            await get_lane("download").run(lambda: None)
+            await release.wait()
+            raise RuntimeError("stopped")
+
+        monkeypatch.setattr(
+            transcribe_service.TranscribeService, "_transcribe_source", download_blocked
+        )
+        service = transcribe_service.TranscribeService()
+        accepted = rejected = 0
+        for i in range(12):
+            try:
+                await service.start(url=f"https://www.youtube.com/watch?v=video{i:06d}")
+                accepted += 1
+            except SchedulerFull:
+                rejected += 1
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0.1)
+        assert get_lane("transcribe").stats()["admitted"] == 0
+        return accepted, rejected
+
+    accepted, rejected = asyncio.run(scenario())
+    assert accepted == 3
+    assert rejected == 9
+
+
+def test_transcribe_start_returns_429_when_full(lanes, monkeypatch):
+    async def never_finishes(self, task_id, task, source_key, url, local_path, priority):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(
+        transcribe_service.TranscribeService, "_transcribe_source", never_finishes
+    )
+    app = FastAPI()
+    app.include_router(transcribe.router, prefix="/api/transcribe")
+
+    with TestClient(app) as client:
+        codes = [
+            client.post(
+                "/api/transcribe/start",
+                json={"url": f"https://www.youtube.com/watch?v=video{i:06d}"},
+            ).status_code
+            for i in range(5)
+        ]
+    assert codes == [200, 200, 200, 429, 429]
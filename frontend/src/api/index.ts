@@ -1,9 +1,12 @@
 import axios from 'axios'
 import type {
   VideoInfo,
+  BatchResult,
   TranscriptionResult,
   NoteResult,
   TaskResponse,
+  TranscriptionSegment,
+  QAStreamEvent,
 } from '@/types'
 
 const api = axios.create({
@@ -40,13 +43,33 @@ export async function getTranscriptionResult(
   return data
 }
 
+/** 批量转录播放列表/频道 */
+export async function startBatchTranscription(
+  url: string,
+  maxItems?: number,
+): Promise<TaskResponse> {
+  const { data } = await api.post('/transcribe/batch/start', {
+    url,
+    max_items: maxItems,
+  }, { timeout: 120000 })
+  return data
+}
+
+/** 获取批量转录结果索引 */
+export async function getBatchResult(batchId: string): Promise<BatchResult> {
+  const { data } = await api.get(`/transcribe/batch/result/${batchId}`)
+  return data
+}
+
 /** 生成笔记 */
 export async function generateNote(
-  transcriptionText: string,
+  transcription: TranscriptionResult,
   language: string = 'zh',
 ): Promise<TaskResponse> {
+  // 服务端已保存转录时只传 ID，避免重复上传全文
   const { data } = await api.post('/note/generate', {
-    transcription_text: transcriptionText,
+    transcript_id: transcription.transcript_id,
+    transcription_text: transcription.transcript_id ? undefined : transcription.text,
     language,
   })
   return data
@@ -58,18 +81,52 @@ export async function getNoteResult(taskId: string): Promise<NoteResult> {
   return data
 }
 
-/** 视频问答 */
-export async function askQuestion(
+/** 视频问答 — 流式返回 SSE 事件，首个事件带 session_id，下一轮传回以继续多轮对话 */
+export async function* askQuestion(
   videoUrl: string,
   question: string,
   context?: string,
-): Promise<TaskResponse> {
-  const { data } = await api.post('/qa/ask', {
-    video_url: videoUrl,
-    question,
-    context,
+  segments?: TranscriptionSegment[],
+  transcriptId?: string,
+  sessionId?: string,
+  signal?: AbortSignal,
+): AsyncGenerator<QAStreamEvent> {
+  // axios 在浏览器中不支持读取流式响应，这里直接用 fetch
+  const resp = await fetch(`${api.defaults.baseURL}/qa/ask`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      video_url: videoUrl,
+      question,
+      context,
+      segments,
+      transcript_id: transcriptId,
+      session_id: sessionId,
+    }),
+    signal,
   })
-  return data
+  if (!resp.ok) throw new Error(`HTTP ${resp.status}`)
+  if (!resp.body) throw new Error('无响应')
+
+  const reader = resp.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    // 一个事件可能跨多次读取，只处理已完整收到的行
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() ?? ''
+    for (const line of lines) {
+      if (!line.startsWith('data: ')) continue
+      try {
+        yield JSON.parse(line.slice(6)) as QAStreamEvent
+      } catch {
+        // skip malformed SSE
+      }
+    }
+  }
 }
 
 /** 开始下载 */
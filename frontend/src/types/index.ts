@@ -20,6 +20,32 @@ export interface TranscriptionResult {
   segments: TranscriptionSegment[]
   language: string
   duration: number
+  transcript_id?: string
+  /** 转录来源：whisper / subtitles（平台人工字幕）/ auto_captions（平台自动字幕） */
+  source?: string
+}
+
+/** 批量转录条目 */
+export interface BatchItem {
+  index: number
+  url: string
+  title: string
+  duration: number
+  status: 'pending' | 'processing' | 'completed' | 'error'
+  progress: number
+  queue_position: number
+  task_id: string | null
+  transcript_id: string | null
+  cached: boolean
+  error: string | null
+}
+
+/** 批量转录结果索引 */
+export interface BatchResult {
+  batch_id: string
+  title: string
+  source: string
+  items: BatchItem[]
 }
 
 /** 笔记结果 */
@@ -36,6 +62,14 @@ export interface QAMessage {
   timestamp: number
 }
 
+/** 问答流式事件：先是 session_id，然后是若干 content，最后是 completed 或 error */
+export interface QAStreamEvent {
+  session_id?: string
+  content?: string
+  status?: 'completed' | 'error'
+  message?: string
+}
+
 /** 下载选项 */
 export interface DownloadOptions {
   format: string
@@ -54,4 +88,10 @@ export interface ProgressEvent {
   progress: number
   message: string
   status: 'processing' | 'completed' | 'error'
+  /** 转录进度事件附带的新解码片段 */
+  segments?: TranscriptionSegment[]
+  /** 已推送的片段数，断线重连时作为 cursor 传回 */
+  cursor?: number
+  /** 排队位置，1 表示下一个执行，0 表示已在执行 */
+  queue_position?: number
 }